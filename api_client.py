@@ -0,0 +1,299 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# =============================
+# CONFIG
+# =============================
+API_BASE = os.getenv("EZEDU_API_BASE", "https://ezedu.kcisbd.com").rstrip("/")
+
+REQUEST_TIMEOUT = float(os.getenv("EZEDU_TIMEOUT", "10"))
+SINGLE_FLIGHT = os.getenv("EZEDU_SINGLE_FLIGHT", "1") != "0"
+MAX_CONNECTIONS = int(os.getenv("EZEDU_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("EZEDU_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("EZEDU_KEEPALIVE_EXPIRY", "30"))
+
+# Resilience: adaptive timeouts, retries and a circuit breaker per endpoint
+RETRIES = int(os.getenv("EZEDU_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("EZEDU_RETRY_BACKOFF", "0.2"))
+MIN_TIMEOUT = float(os.getenv("EZEDU_MIN_TIMEOUT", "2"))
+TIMEOUT_MULTIPLIER = float(os.getenv("EZEDU_TIMEOUT_MULTIPLIER", "3"))
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+BREAKER_FAILURES = int(os.getenv("EZEDU_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("EZEDU_BREAKER_COOLDOWN", "30"))
+
+HEADERS = {
+    'Accept': '*/*',
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'User-Agent': 'Mozilla/5.0'
+}
+
+# =============================
+# EVENT LOOP
+# =============================
+# One long-lived loop in a daemon thread owns the pooled client, so every
+# Streamlit session shares the same connections instead of blocking its own
+# script thread on a socket.
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_inflight = {}
+single_flight_stats = {"upstream": 0, "coalesced": 0}
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background event loop, starting it on first use."""
+    global _loop
+
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="ezedu-api-loop", daemon=True)
+            thread.start()
+            _loop = loop
+    return _loop
+
+
+def run_async(coro):
+    """Run a coroutine on the shared loop and block until it finishes."""
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_async() called from the API loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def iterate_async(agen):
+    """Iterate an async generator from sync code, one step at a time on the shared loop."""
+    try:
+        while True:
+            try:
+                yield run_async(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_async(agen.aclose())
+
+
+# =============================
+# RESILIENCE
+# =============================
+class ServiceUnavailable(Exception):
+    """Raised without touching the network while an endpoint's circuit is open."""
+
+
+# What tools should treat as "the school API is down" rather than a bug
+UPSTREAM_ERRORS = (ServiceUnavailable, httpx.TransportError)
+
+
+class EndpointHealth:
+    """Latency window and circuit breaker for one /Api/<endpoint>.
+
+    Only touched from the API loop, so no locking is needed.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.counts = {"ok": 0, "failed": 0, "retried": 0, "short_circuited": 0}
+
+    def percentile(self, q: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout(self) -> float:
+        """A few times the observed p99, kept between MIN_TIMEOUT and REQUEST_TIMEOUT."""
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return REQUEST_TIMEOUT
+        return min(REQUEST_TIMEOUT, max(MIN_TIMEOUT, self.percentile(0.99) * TIMEOUT_MULTIPLIER))
+
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < BREAKER_COOLDOWN:
+            return "open"
+        return "half-open"
+
+    def allow_request(self) -> bool:
+        state = self.state()
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True   # let exactly one request test the endpoint
+            return True
+        self.counts["short_circuited"] += 1
+        return False
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.counts["ok"] += 1
+        if self.opened_at is not None:
+            print(f"✅ {self.endpoint} recovered, circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.counts["failed"] += 1
+        self.failures += 1
+        if self.probing or self.failures >= BREAKER_FAILURES:
+            if self.opened_at is None:
+                print(f"⚠️ {self.endpoint} failing, circuit opened for {BREAKER_COOLDOWN:.0f}s")
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+_health = {}
+
+
+def get_health(endpoint: str) -> EndpointHealth:
+    if endpoint not in _health:
+        _health[endpoint] = EndpointHealth(endpoint)
+    return _health[endpoint]
+
+
+def endpoint_health() -> dict:
+    """Latency percentiles, current timeout and breaker state for every endpoint seen."""
+    report = {}
+    for endpoint, health in _health.items():
+        p50, p99 = health.percentile(0.5), health.percentile(0.99)
+        report[endpoint] = {
+            "state": health.state(),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "timeout_s": round(health.timeout(), 2),
+            **health.counts,
+        }
+    return report
+
+
+# =============================
+# HTTP CLIENT
+# =============================
+def get_client() -> httpx.AsyncClient:
+    """Return the pooled async client (must be called on the shared loop)."""
+    global _client
+
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=REQUEST_TIMEOUT,
+            verify=False,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        print(f"✅ Async API client created ({MAX_CONNECTIONS} connections, {MAX_KEEPALIVE_CONNECTIONS} keep-alive)")
+    return _client
+
+
+async def single_flight(key, request) -> httpx.Response:
+    """Share one upstream request between concurrent identical calls.
+
+    All API calls run on the shared loop, so a plain dict of in-flight futures
+    is enough: the first caller starts the request, later callers with the
+    same key await the same future and get the same response.
+    """
+    if not SINGLE_FLIGHT:
+        single_flight_stats["upstream"] += 1
+        return await request()
+
+    future = _inflight.get(key)
+    if future is None:
+        single_flight_stats["upstream"] += 1
+        future = asyncio.ensure_future(request())
+        _inflight[key] = future
+        future.add_done_callback(lambda done: _inflight.pop(key, None) if _inflight.get(key) is done else None)
+    else:
+        single_flight_stats["coalesced"] += 1
+
+    # shield: one caller giving up must not cancel the request for the others
+    return await asyncio.shield(future)
+
+
+async def send_request(method: str, endpoint: str, idempotent: bool, **kwargs) -> httpx.Response:
+    """Send one API call with an adaptive timeout, jittered retries and the circuit breaker.
+
+    Only idempotent calls are retried. Transport errors, timeouts and 5xx
+    responses count as failures; once an endpoint fails BREAKER_FAILURES times
+    in a row, calls raise ServiceUnavailable until a probe succeeds.
+    """
+    url = f"{API_BASE}/index.php/Api/{endpoint}"
+    health = get_health(endpoint)
+    attempts = 1 + (RETRIES if idempotent else 0)
+    error, response = None, None
+
+    for attempt in range(attempts):
+        if not health.allow_request():
+            raise ServiceUnavailable(f"{endpoint} is temporarily unavailable")
+        probe = health.probing   # this request is the half-open probe
+
+        start = time.monotonic()
+        try:
+            response = await get_client().request(method, url, timeout=health.timeout(), **kwargs)
+        except httpx.TransportError as e:
+            error, response = e, None
+            health.record_failure()
+        else:
+            if response.status_code < 500:
+                health.record_success(time.monotonic() - start)
+                return response
+            error = None
+            health.record_failure()
+        finally:
+            # A cancelled probe, or one that raised something else, must not
+            # leave the endpoint waiting forever for a probe that never ends
+            if probe:
+                health.probing = False
+
+        if attempt + 1 < attempts:
+            health.counts["retried"] += 1
+            await asyncio.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+
+    if response is None:
+        raise error
+    return response
+
+
+async def api_post(endpoint: str, data: dict, idempotent: bool = False) -> httpx.Response:
+    """POST form data to /index.php/Api/<endpoint>.
+
+    Pass idempotent=True for read-only endpoints so they may be retried.
+    """
+    key = ("POST", endpoint, tuple(sorted(data.items())))
+    return await single_flight(key, lambda: send_request("POST", endpoint, idempotent, data=data))
+
+
+async def api_get(endpoint: str, headers: dict = None) -> httpx.Response:
+    """GET /index.php/Api/<endpoint> (always retried on failure)."""
+    key = ("GET", endpoint, tuple(sorted((headers or {}).items())))
+    return await single_flight(key, lambda: send_request("GET", endpoint, True, headers=headers))
+
+
+async def close_client():
+    """Close the pooled client (used by benchmarks and tests)."""
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,1107 @@
+"""Backend benchmarks against the local mock API (see mock_api.py).
+
+    python bench.py async-tools --sessions 50 --latency 0.2
+    python bench.py parallel-tools --latency 0.5
+    python bench.py single-flight --callers 200
+    python bench.py resilience
+    python bench.py projection
+    python bench.py load --users 50 --turns 10 --latency 0.2 --llm-latency 0.3
+    python bench.py ttft
+    python bench.py prompt
+    python bench.py history --turns 30 --budget 6000
+    python bench.py summary --turns 40
+    python bench.py checkpoint --turns 30
+    python bench.py memory
+    python bench.py tool-schemas
+    python bench.py startup --runs 5
+    python bench.py embeddings
+    python bench.py document-index --shards 8 --chunks 5000
+    python bench.py ingest --pages 300
+    python bench.py namespaces --sessions 200 --cap-mb 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from mock_api import start_mock_server
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+# Benches send their own state; the checkpoint bench compiles its own graphs
+os.environ.setdefault("FIONA_CHECKPOINTER", "none")
+
+
+def start_backend(latency):
+    """Start a mock API and point the backend at it before it is imported."""
+    server, base_url = start_mock_server(latency=latency)
+    os.environ["EZEDU_API_BASE"] = base_url
+    import api_client
+    api_client.API_BASE = base_url
+    return server, base_url
+
+
+class ScriptedChatModel(GenericFakeChatModel):
+    """Fake chat model that replays scripted replies and accepts bind_tools()."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def scripted_model(*replies):
+    return ScriptedChatModel(messages=iter(replies))
+
+
+def tool_call(name, args, call_id):
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+class FakeSchoolChatModel(BaseChatModel):
+    """Stand-in for gpt-4o-mini that picks tools by keyword, like the real prompt asks.
+
+    A human message gets a tool call (sid/temp read from the session block of
+    the system prompt); a tool result gets a one-line answer. `latency` is
+    the time to the first token and `token_delay` the time per further token,
+    for both invoke and streaming.
+    """
+
+    latency: float = 0.0
+    token_delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-school"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content="এখানে আপনার তথ্য। 📋")
+
+        prompt = messages[0].content if messages else ""
+        if prompt.startswith("You keep a running summary"):
+            return AIMessage(content="আগের আলোচনা: Student 1001 (SID 1001) logged in; asked for results, homework and the calendar.")
+        sid = (re.search(r"SID: (\S+)", prompt) or [None, "1001"])[1]
+        temp = (re.search(r"TEMP: (\S+)", prompt) or [None, "T1001"])[1]
+        text = str(last.content).lower()
+        intents = [
+            ("class test", "get_unit_test_result", {"sid": sid, "temp": temp, "term": "1"}),
+            ("result", "get_term_result", {"sid": sid, "temp": temp, "term": "1"}),
+            ("week", "get_homework_range", {"temp": temp, "start": "this week"}),
+            ("homework", "get_homework", {"temp": temp, "entry_date": "today"}),
+            ("worksheet", "get_worksheet", {"temp": temp, "entry_date": "today"}),
+            ("syllabus", "get_syllabus", {"temp": temp}),
+            ("calendar", "get_calendar", {}),
+        ]
+        for keyword, name, args in intents:
+            if keyword in text:
+                # Like the real model, answer from the prompt's tool memory when it has this result
+                shown = ", ".join(f"{k}={v}" for k, v in args.items() if k not in ("sid", "temp"))
+                if f"- {name}({shown}):" in prompt:
+                    return AIMessage(content="আগের ফলাফল থেকে বলছি। 📋")
+                return AIMessage(content="", tool_calls=[tool_call(name, args, f"call_{time.perf_counter_ns()}")])
+        return AIMessage(content="আসসালামু আলাইকুম! আমি কীভাবে সাহায্য করতে পারি? রেজাল্ট, হোমওয়ার্ক বা ক্যালেন্ডার জানতে চাইলে বলুন।")
+
+    def _chunks(self, reply):
+        if reply.tool_calls:
+            return [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(reply.tool_calls)])]
+        words = reply.content.split(" ")
+        return [AIMessageChunk(content=word if i == 0 else " " + word) for i, word in enumerate(words)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        time.sleep(self.latency + self.token_delay * (len(self._chunks(reply)) - 1))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        await asyncio.sleep(self.latency + self.token_delay * (len(self._chunks(reply)) - 1))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i, chunk in enumerate(self._chunks(self._reply(messages))):
+            time.sleep(self.latency if i == 0 else self.token_delay)
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i, chunk in enumerate(self._chunks(self._reply(messages))):
+            await asyncio.sleep(self.latency if i == 0 else self.token_delay)
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+class ToolTimer(BaseCallbackHandler):
+    """Collects wall-clock duration per tool name from LangChain callbacks."""
+
+    def __init__(self):
+        self.started = {}
+        self.durations = {}
+        self.lock = threading.Lock()
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self.started[run_id] = (serialized.get("name"), time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        name, start = self.started.pop(run_id, (None, None))
+        if name is not None:
+            with self.lock:
+                self.durations.setdefault(name, []).append(time.perf_counter() - start)
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def session_calls(sid):
+    """The tool calls a typical logged-in session makes."""
+    temp = f"T{sid}"
+    return [
+        ("get_term_result", {"sid": sid, "temp": temp, "term": "1"}),
+        ("get_unit_test_result", {"sid": sid, "temp": temp, "term": "1"}),
+        ("get_homework", {"temp": temp, "entry_date": "2026-01-10"}),
+        ("get_syllabus", {"temp": temp}),
+    ]
+
+
+# =============================
+# ASYNC TOOLS VS BLOCKING SESSION
+# =============================
+def bench_async_tools(args):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    server, base_url = start_backend(args.latency)
+
+    import streamlit_backend
+    from api_client import get_loop, run_async
+
+    tools = {t.name: t for t in streamlit_backend.tools}
+    endpoints = {
+        "get_term_result": "getTermResult",
+        "get_unit_test_result": "getUnitTestResult",
+        "get_homework": "getDiary",
+        "get_syllabus": "getSyllabus",
+    }
+    sids = [str(1000 + i) for i in range(args.sessions)]
+    total_calls = sum(len(session_calls(sid)) for sid in sids)
+
+    # The old backend: one shared requests.Session, one blocking thread per session
+    legacy = requests.Session()
+    legacy.mount("http://", HTTPAdapter(pool_maxsize=args.workers))
+
+    def legacy_session(sid):
+        for name, payload in session_calls(sid):
+            legacy.post(f"{base_url}/index.php/Api/{endpoints[name]}", data=payload, timeout=10).json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(legacy_session, sids))
+    legacy_elapsed = time.perf_counter() - start
+
+    async def async_session(sid):
+        for name, payload in session_calls(sid):
+            await tools[name].ainvoke(payload)
+
+    async def run_all():
+        await asyncio.gather(*(async_session(sid) for sid in sids))
+
+    get_loop()
+    run_async(run_all())  # warm the connection pool
+    streamlit_backend.student_cache.clear()  # measure the network path, not the cache
+    start = time.perf_counter()
+    run_async(run_all())
+    async_elapsed = time.perf_counter() - start
+
+    print(f"\n{args.sessions} sessions x 4 tool calls, {args.latency * 1000:.0f} ms API latency")
+    print(f"  blocking session ({args.workers:>2} threads):  {legacy_elapsed:6.2f}s  {total_calls / legacy_elapsed:7.1f} calls/s")
+    print(f"  async pooled client (1 loop):     {async_elapsed:6.2f}s  {total_calls / async_elapsed:7.1f} calls/s")
+    print(f"  speed-up: {legacy_elapsed / async_elapsed:.1f}x")
+    server.shutdown()
+
+
+# =============================
+# PARALLEL TOOL CALLS IN ONE TURN
+# =============================
+def bench_parallel_tools(args):
+    server, base_url = start_backend(args.latency)
+
+    import streamlit_backend
+    from api_client import run_async
+
+    calls = [
+        tool_call("get_term_result", {"sid": "1001", "temp": "T1001", "term": "1"}, "call_1"),
+        tool_call("get_unit_test_result", {"sid": "1001", "temp": "T1001", "term": "1"}, "call_2"),
+        tool_call("get_homework", {"temp": "T1001", "entry_date": "today"}, "call_3"),
+        tool_call("get_worksheet", {"temp": "T1001", "entry_date": "today"}, "call_4"),
+        tool_call("get_term_result", {"sid": "1001"}, "call_5"),  # bad arguments: must fail alone
+    ]
+    state = {"messages": [HumanMessage("result, class test, homework and worksheet")],
+             "user_session": {"sid": "1001", "temp": "T1001", "name": "Student 1001"},
+             "saved_students": []}
+
+    def run_turn():
+        streamlit_backend.use_chat_model(scripted_model(AIMessage(content="", tool_calls=calls),
+                                                        AIMessage(content="done")))
+        start = time.perf_counter()
+        result = run_async(streamlit_backend.get_chatbot().ainvoke(state))
+        return time.perf_counter() - start, result
+
+    run_turn()  # warm-up
+    streamlit_backend.student_cache.clear()
+    elapsed, result = run_turn()
+    tool_messages = [m for m in result["messages"] if isinstance(m, ToolMessage)]
+
+    print(f"\n{len(calls)} tool calls in one turn, {args.latency * 1000:.0f} ms API latency")
+    for call, msg in zip(calls, tool_messages):
+        outcome = "error" if "error" in json.loads(msg.content) else "ok"
+        print(f"  {call['id']} {call['name']:<22} -> {msg.tool_call_id} {outcome}")
+    print(f"  turn latency: {elapsed:.2f}s (sequential would be ~{(len(calls) - 1) * args.latency:.2f}s)")
+    server.shutdown()
+
+
+# =============================
+# SINGLE-FLIGHT STRESS TEST
+# =============================
+def bench_single_flight(args):
+    server, base_url = start_backend(args.latency)
+
+    import api_client
+    import streamlit_backend
+    from api_client import run_async
+
+    payload = {"sid": "1001", "temp": "T1001", "term": "1"}
+
+    async def burst():
+        return await asyncio.gather(*(streamlit_backend.get_term_result.ainvoke(payload)
+                                      for _ in range(args.callers)))
+
+    print(f"\n{args.callers} concurrent identical get_term_result calls, {args.latency * 1000:.0f} ms API latency")
+    for enabled in (False, True):
+        api_client.SINGLE_FLIGHT = enabled
+        streamlit_backend.student_cache.clear()
+        server.state.hits.clear()
+
+        start = time.perf_counter()
+        outputs = run_async(burst())
+        elapsed = time.perf_counter() - start
+
+        ok = sum(1 for out in outputs if json.loads(out).get("status") == "success")
+        upstream = server.state.hits.get("getTermResult", 0)
+        label = "single-flight" if enabled else "no coalescing"
+        print(f"  {label:<14} upstream calls: {upstream:>4}   successful answers: {ok:>4}   {elapsed:.2f}s")
+
+    assert upstream == 1, f"expected 1 upstream call with single-flight, got {upstream}"
+    server.shutdown()
+
+
+# =============================
+# RESILIENCE UNDER INJECTED FAULTS
+# =============================
+def bench_resilience(args):
+    server, base_url = start_backend(0.05)
+
+    import api_client
+    import streamlit_backend
+    from api_client import endpoint_health, run_async
+
+    # Short knobs so the whole outage fits in a few seconds
+    api_client.MIN_TIMEOUT = 0.2
+    api_client.BREAKER_COOLDOWN = args.cooldown
+    streamlit_backend.student_cache.ttl = 0  # every lookup misses, but stale copies remain
+
+    def phase(label, calls):
+        outcomes = {}
+        start = time.perf_counter()
+        for i in range(calls):
+            payload = {"sid": str(1000 + i % 10), "temp": "T1", "term": "1"}
+            out = json.loads(run_async(streamlit_backend.get_term_result.ainvoke(payload)))
+            kind = "stale" if out.get("stale") else "ok" if out.get("status") == "success" else "error"
+            outcomes[kind] = outcomes.get(kind, 0) + 1
+        elapsed = time.perf_counter() - start
+        health = endpoint_health()["getTermResult"]
+        print(f"  {label:<10} {calls:>3} calls  {elapsed / calls * 1000:7.1f} ms/call  "
+              f"breaker={health['state']:<9} timeout={health['timeout_s']}s  {outcomes}")
+
+    print(f"\nget_term_result against a fault-injecting mock API")
+    phase("healthy", 40)
+    server.state.hang_rate, server.state.hang = 1.0, 5.0
+    phase("hanging", 20)
+    server.state.hang_rate, server.state.error_rate = 0.0, 1.0
+    time.sleep(args.cooldown)
+    phase("500s", 20)
+    server.state.error_rate = 0.0
+    time.sleep(args.cooldown)
+    phase("recovered", 20)
+    print(f"  totals: {endpoint_health()['getTermResult']}")
+    server.shutdown()
+
+
+# =============================
+# TOOL RESULT TOKENS
+# =============================
+def bench_projection(args):
+    server, base_url = start_backend(0.0)
+
+    import streamlit_backend
+    from streamlit_backend import count_tokens, project_tool_message, tools
+
+    by_name = {t.name: t for t in tools}
+    calls = [
+        ("get_term_result", {"sid": "1001", "temp": "T1001", "term": "1"}),
+        ("get_unit_test_result", {"sid": "1001", "temp": "T1001", "term": "1"}),
+        ("get_homework", {"temp": "T1001", "entry_date": "today"}),
+        ("get_homework_range", {"temp": "T1001", "start": "this week"}),
+        ("get_syllabus", {"temp": "T1001"}),
+        ("get_worksheet", {"temp": "T1001", "entry_date": "today"}),
+        ("get_worksheet_range", {"temp": "T1001", "start": "this week"}),
+        ("get_calendar", {}),
+    ]
+
+    print(f"\nToolMessage tokens sent to the LLM ({streamlit_backend.TOKEN_ENCODING})")
+    print(f"  {'tool':<22} {'full':>6} {'compact':>8} {'saved':>6}")
+    total_full = total_compact = 0
+    for i, (name, payload) in enumerate(calls):
+        full = by_name[name].invoke(payload)
+        message = project_tool_message(ToolMessage(content=full, name=name, tool_call_id=f"call_{i}"))
+        full_tokens, compact_tokens = count_tokens(full), count_tokens(message.content)
+        total_full += full_tokens
+        total_compact += compact_tokens
+        print(f"  {name:<22} {full_tokens:>6} {compact_tokens:>8} {1 - compact_tokens / full_tokens:>6.0%}")
+    print(f"  {'total':<22} {total_full:>6} {total_compact:>8} {1 - total_compact / total_full:>6.0%}")
+    server.shutdown()
+
+
+# =============================
+# LOAD TEST
+# =============================
+LOAD_MESSAGES = ["আমার result", "আজকের homework", "syllabus", "calendar", "worksheet", "class test", "this week homework"]
+
+
+def bench_load(args):
+    server, base_url = start_backend(args.latency)
+    server.state.payload_scale = args.payload_scale
+    server.state.error_rate = args.error_rate
+
+    import streamlit_backend
+
+    streamlit_backend.use_chat_model(FakeSchoolChatModel(latency=args.llm_latency))
+    streamlit_backend.FAST_PATH = not args.no_fast_path
+    streamlit_backend.AFTER_RENDER_TOOLS = args.after_tools
+    if args.cold:
+        streamlit_backend.student_cache.max_bytes = 0
+        streamlit_backend.calendar_cache.ttl = streamlit_backend.calendar_cache.stale_ttl = 0
+        streamlit_backend.PREFETCH_ON_LOGIN = False
+
+    timer = ToolTimer()
+    turn_times, errors = [], []
+    lock = threading.Lock()
+
+    def user(index):
+        sid = str(2000 + index)
+        user_session = {"sid": sid, "temp": f"T{sid}", "name": f"Student {sid}"}
+        for turn in range(args.turns):
+            state = {"messages": [HumanMessage(LOAD_MESSAGES[(index + turn) % len(LOAD_MESSAGES)])],
+                     "user_session": user_session, "saved_students": []}
+            start = time.perf_counter()
+            try:
+                streamlit_backend.get_chatbot().invoke(state, config={"callbacks": [timer]})
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                turn_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(user, range(args.users)))
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{args.users} users x {args.turns} turns, API {args.latency * 1000:.0f} ms, "
+          f"LLM {args.llm_latency * 1000:.0f} ms, payload x{args.payload_scale}{', cold caches' if args.cold else ''}"
+          f"{', no fast path' if args.no_fast_path else ''}, after render-only tools: {args.after_tools}")
+    print(f"  turns: {len(turn_times)} ok, {len(errors)} failed in {elapsed:.2f}s -> {len(turn_times) / elapsed:.1f} turns/s")
+    p50, p95, p99 = percentiles(turn_times)
+    print(f"  {'turn':<22} n={len(turn_times):<5} p50={p50 * 1000:7.1f} ms  p95={p95 * 1000:7.1f} ms  p99={p99 * 1000:7.1f} ms")
+    for name, samples in sorted(timer.durations.items()):
+        p50, p95, p99 = percentiles(samples)
+        print(f"  {name:<22} n={len(samples):<5} p50={p50 * 1000:7.1f} ms  p95={p95 * 1000:7.1f} ms  p99={p99 * 1000:7.1f} ms")
+    stats = streamlit_backend.fast_path_stats()
+    print(f"  fast path: {stats['fast_path']} of {stats['fast_path'] + stats['llm']} turns ({stats['hit_rate']:.0%}), "
+          f"{stats['llm_calls_saved']} LLM calls and ~{stats['seconds_saved']:.1f}s saved")
+    print(f"  LLM calls: {stats['llm_calls']} ({stats['llm_calls'] / max(1, len(turn_times)):.2f} per turn)")
+    print(f"  upstream calls: {dict(server.state.hits)}")
+    server.shutdown()
+
+
+# =============================
+# TIME TO FIRST TOKEN
+# =============================
+def bench_ttft(args):
+    server, base_url = start_backend(args.latency)
+
+    import streamlit_backend
+    from api_client import iterate_async, run_async
+
+    streamlit_backend.use_chat_model(FakeSchoolChatModel(latency=args.llm_latency, token_delay=args.token_delay))
+    user_session = {"sid": "1001", "temp": "T1001", "name": "Student 1001"}
+
+    print(f"\nAPI {args.latency * 1000:.0f} ms, LLM first token {args.llm_latency * 1000:.0f} ms "
+          f"+ {args.token_delay * 1000:.0f} ms/token")
+    # "what's on the calendar" is not a fast-path phrase, so the LLM picks the tool
+    for label, text in (("chat only", "hello"), ("with a tool", "what's on the calendar")):
+        state = {"messages": [HumanMessage(text)], "user_session": user_session, "saved_students": []}
+        streamlit_backend.calendar_cache.invalidate()
+
+        start = time.perf_counter()
+        run_async(streamlit_backend.get_chatbot().ainvoke(state))
+        invoke_total = time.perf_counter() - start
+
+        streamlit_backend.calendar_cache.invalidate()
+        first_token = first_card = None
+        start = time.perf_counter()
+        for mode, chunk in iterate_async(streamlit_backend.get_chatbot().astream(state, stream_mode=["messages", "updates"])):
+            now = time.perf_counter() - start
+            if mode == "messages" and first_token is None and isinstance(chunk[0], AIMessageChunk) and chunk[0].content:
+                first_token = now
+            if mode == "updates" and first_card is None and "tools" in chunk:
+                first_card = now
+        stream_total = time.perf_counter() - start
+
+        card = f"first tool card {first_card * 1000:6.0f} ms  " if first_card is not None else ""
+        token = f"first token {first_token * 1000:6.0f} ms  " if first_token is not None else ""
+        print(f"  {label:<12} invoke: done {invoke_total * 1000:6.0f} ms | "
+              f"stream: {card}{token}done {stream_total * 1000:6.0f} ms")
+    server.shutdown()
+
+
+# =============================
+# PROMPT CACHEABILITY
+# =============================
+def bench_prompt(args):
+    import streamlit_backend
+    from streamlit_backend import count_tokens, system_prompt_for
+    from system_prompt import SYSTEM_PROMPT
+
+    saved = [{"name": f"Student {i}", "sid": str(1000 + i)} for i in range(3)]
+    sessions = [
+        ("logged out", {}, []),
+        ("logged in", {"name": "Student 1001", "sid": "1001", "temp": "T1001"}, []),
+        ("logged in + 3 saved", {"name": "Student 1001", "sid": "1001", "temp": "T1001"}, saved),
+    ]
+    static = count_tokens(SYSTEM_PROMPT)
+    # OpenAI caches prompts of 1024+ tokens in 128-token steps of identical prefix
+    cacheable = static // 128 * 128 if static >= 1024 else 0
+
+    print(f"\nSystem prompt tokens ({streamlit_backend.TOKEN_ENCODING}); static prefix = {static}")
+    print(f"  {'session':<22} {'total':>6} {'dynamic':>8} {'cacheable':>10}")
+    for label, user_session, saved_students in sessions:
+        prompt = system_prompt_for(user_session, saved_students)
+        assert prompt.startswith(SYSTEM_PROMPT)
+        total = count_tokens(prompt)
+        print(f"  {label:<22} {total:>6} {total - static:>8} {cacheable / total:>10.1%}")
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        system_prompt_for(sessions[2][1], sessions[2][2])
+    print(f"  memoized build: {(time.perf_counter() - start) / 10000 * 1e6:.1f} µs per call")
+
+
+# =============================
+# HISTORY TRIMMING
+# =============================
+def bench_history(args):
+    import streamlit_backend
+
+    streamlit_backend.PROMPT_TOKEN_BUDGET = args.budget
+    user_session = {"sid": "1001", "temp": "T1001", "name": "Student 1001"}
+    short_answer = "ঠিক আছে! 😊"
+    long_answer = "এখানে বিস্তারিত ব্যাখ্যা দেওয়া হলো। " * 25
+
+    history = []
+    print(f"\nPrompt tokens per turn: last 8 messages vs a {args.budget}-token budget "
+          f"({streamlit_backend.TOKEN_ENCODING})")
+    print(f"  {'turn':>4} {'8 messages':>11} {'budget':>7} {'sent':>5} {'dropped':>8} {'build ms':>9}")
+    for turn in range(1, args.turns + 1):
+        history.append(HumanMessage(f"প্রশ্ন {turn}: আমার হোমওয়ার্ক নিয়ে একটা কথা জানতে চাই"))
+        state = {"messages": history, "user_session": user_session, "saved_students": []}
+
+        count_trimmed = {**state, "messages": history[-8:]}
+        streamlit_backend.PROMPT_TOKEN_BUDGET = 10 ** 9
+        _, by_count = streamlit_backend.build_llm_messages(count_trimmed)
+        streamlit_backend.PROMPT_TOKEN_BUDGET = args.budget
+        start = time.perf_counter()
+        _, metrics = streamlit_backend.build_llm_messages(state)
+        elapsed = time.perf_counter() - start
+
+        if turn % args.every == 0:
+            print(f"  {turn:>4} {by_count['prompt_tokens']:>11} {metrics['prompt_tokens']:>7} "
+                  f"{metrics['messages_sent']:>5} {metrics['messages_dropped']:>8} {elapsed * 1000:>9.2f}")
+        # every fifth answer is long, the rest are one-liners
+        history.append(AIMessage(long_answer if turn % 5 == 0 else short_answer))
+
+
+# =============================
+# ROLLING SUMMARY
+# =============================
+SUMMARY_MESSAGES = ["hello", "what's on the calendar", "আমার result", "homework for the week please",
+                    "what is the syllabus for science", "class test"]
+
+
+def bench_summary(args):
+    server, base_url = start_backend(args.latency)
+
+    import streamlit_backend
+
+    streamlit_backend.use_chat_model(FakeSchoolChatModel())
+    streamlit_backend.FAST_PATH = False
+    streamlit_backend.AFTER_RENDER_TOOLS = "llm"
+    streamlit_backend.PROMPT_TOKEN_BUDGET = 10 ** 9   # measure growth, not trimming
+    user_session = {"sid": "1001", "temp": "T1001", "name": "Student 1001"}
+
+    print(f"\nPrompt tokens for the next turn over a {args.turns}-turn session "
+          f"(summary after {streamlit_backend.SUMMARY_TRIGGER_TOKENS} history tokens)")
+    print(f"  {'turn':>4} {'no summary':>11} {'summary':>8} {'messages':>9} {'summary tokens':>15}")
+    states = {}
+    for summarize in (False, True):
+        streamlit_backend.SUMMARIZE = summarize
+        state = {"messages": [], "user_session": user_session, "saved_students": [], "summary": ""}
+        for turn in range(1, args.turns + 1):
+            state["messages"] = list(state["messages"]) + [HumanMessage(SUMMARY_MESSAGES[turn % len(SUMMARY_MESSAGES)])]
+            state = streamlit_backend.get_chatbot().invoke(state)
+            _, metrics = streamlit_backend.build_llm_messages(state)
+            states.setdefault(turn, []).append((metrics["prompt_tokens"], len(state["messages"]),
+                                                streamlit_backend.count_tokens(state.get("summary", ""))))
+
+    for turn, ((plain, _, _), (summarized, messages, summary_tokens)) in states.items():
+        if turn % args.every == 0:
+            print(f"  {turn:>4} {plain:>11} {summarized:>8} {messages:>9} {summary_tokens:>15}")
+    server.shutdown()
+
+
+# =============================
+# CHECKPOINTED STATE
+# =============================
+def bench_checkpoint(args):
+    import tempfile
+
+    server, base_url = start_backend(0.0)
+
+    import streamlit_backend
+    from api_client import run_async
+
+    streamlit_backend.use_chat_model(FakeSchoolChatModel())
+    streamlit_backend.SUMMARIZE = False
+    user_session = {"sid": "1001", "temp": "T1001", "name": "Student 1001"}
+    directory = tempfile.mkdtemp()
+
+    print(f"\n{args.turns} turns per session, {args.sessions} sessions")
+    print(f"  {'state':<28} {'p50 turn':>9} {'p95 turn':>9} {'input kB/turn':>14}")
+    for kind in ("none", "memory", "sqlite"):
+        streamlit_backend.CHECKPOINT_DB = os.path.join(directory, "bench.sqlite")
+        chatbot = streamlit_backend.build_graph().compile(checkpointer=streamlit_backend.make_checkpointer(kind))
+        turn_times, sent = [], 0
+
+        async def session(index):
+            nonlocal sent
+            config = streamlit_backend.thread_config(f"bench-{kind}-{index}")
+            history = []
+            for turn in range(args.turns):
+                message = HumanMessage(SUMMARY_MESSAGES[turn % len(SUMMARY_MESSAGES)])
+                # Without a checkpointer the caller re-sends the whole history
+                messages = history + [message] if kind == "none" else [message]
+                sent += sum(len(str(m.content).encode()) for m in messages)
+                state = {"messages": messages, "user_session": user_session, "saved_students": []}
+                start = time.perf_counter()
+                if kind == "none":
+                    result = await chatbot.ainvoke(state)
+                else:
+                    result = await chatbot.ainvoke(state, config, durability="exit")
+                turn_times.append(time.perf_counter() - start)
+                history = [m for m in result["messages"] if isinstance(m, HumanMessage)
+                           or (isinstance(m, AIMessage) and m.content)]
+
+        async def run_all():
+            await asyncio.gather(*(session(i) for i in range(args.sessions)))
+
+        run_async(run_all())
+        p50, p95, _ = percentiles(turn_times)
+        label = {"none": "stateless (history re-sent)", "memory": "InMemorySaver", "sqlite": "AsyncSqliteSaver"}[kind]
+        print(f"  {label:<28} {p50 * 1000:>7.1f}ms {p95 * 1000:>7.1f}ms "
+              f"{sent / len(turn_times) / 1024:>14.2f}")
+    server.shutdown()
+
+
+# =============================
+# TOOL MEMORY
+# =============================
+def bench_memory(args):
+    server, base_url = start_backend(args.latency)
+
+    import streamlit_backend
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    streamlit_backend.use_chat_model(FakeSchoolChatModel(latency=args.llm_latency))
+    streamlit_backend.SUMMARIZE = False
+    streamlit_backend.student_cache.max_bytes = 0   # every refetch goes to the API
+    user_session = {"sid": "1001", "temp": "T1001", "name": "Student 1001"}
+    # Room for the system prompt and a couple of short turns, so the term
+    # result's ToolMessage is trimmed out before the follow-up questions
+    prompt = streamlit_backend.system_prompt_for(user_session, [])
+    streamlit_backend.PROMPT_TOKEN_BUDGET = streamlit_backend.count_tokens(prompt) + args.history_tokens
+    script = ["term 1 result"] + ["hello"] * args.chatter + ["what was my result in term 1?"] * args.followups
+
+    print(f"\n{args.chatter} small-talk turns, then {args.followups} follow-ups about the term 1 result "
+          f"(LLM {args.llm_latency * 1000:.0f} ms, API {args.latency * 1000:.0f} ms)")
+    for enabled in (False, True):
+        streamlit_backend.TOOL_MEMORY = enabled
+        chatbot = streamlit_backend.build_graph().compile(checkpointer=InMemorySaver())
+        config = streamlit_backend.thread_config(f"memory-{enabled}")
+        llm_calls = streamlit_backend.router_stats["llm_calls"]
+        timer = ToolTimer()
+        followup_times = []
+        for i, text in enumerate(script):
+            state = {"messages": [HumanMessage(text)], "user_session": user_session, "saved_students": []}
+            start = time.perf_counter()
+            chatbot.invoke(state, {**config, "callbacks": [timer]})
+            if i > args.chatter:
+                followup_times.append(time.perf_counter() - start)
+
+        refetches = len(timer.durations.get("get_term_result", [])) - 1
+        print(f"  tool memory {'on ' if enabled else 'off'}: {refetches} getTermResult refetches, "
+              f"{streamlit_backend.router_stats['llm_calls'] - llm_calls} LLM calls, "
+              f"follow-up p50 {statistics.median(followup_times) * 1000:.0f} ms")
+    server.shutdown()
+
+
+# =============================
+# TOOL SCHEMA VARIANTS
+# =============================
+def bench_tool_schemas(args):
+    import streamlit_backend
+    from streamlit_backend import TOOL_VARIANTS, count_tokens, system_prompt_for, tool_schema_tokens
+
+    full = tool_schema_tokens("logged_in")
+    system = count_tokens(system_prompt_for({}, []))
+    print(f"\nTool schema tokens per call ({streamlit_backend.TOKEN_ENCODING}); logged-out system prompt = {system}")
+    for variant, variant_tools in TOOL_VARIANTS.items():
+        tokens = tool_schema_tokens(variant)
+        print(f"  {variant:<11} {len(variant_tools):>2} tools {tokens:>6} tokens  "
+              f"saves {full - tokens:>5} ({(full - tokens) / (full + system):.1%} of the logged-out prompt)")
+
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        streamlit_backend.get_llm().bind_tools(streamlit_backend.tools, parallel_tool_calls=True)
+    per_bind = (time.perf_counter() - start) / args.calls
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        streamlit_backend.get_tool_models()[streamlit_backend.tool_variant({"messages": [], "user_session": {}})]
+    per_lookup = (time.perf_counter() - start) / args.calls
+    print(f"  bind_tools per call: {per_bind * 1e6:.0f} µs; precomputed variant lookup: {per_lookup * 1e6:.2f} µs")
+
+
+# =============================
+# COLD START
+# =============================
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import streamlit_backend
+imported = time.perf_counter()
+if {eager}:
+    # What the module used to do at import time
+    import docx, PyPDF2, tiktoken
+    from langchain_community.vectorstores import FAISS
+    streamlit_backend.get_llm(), streamlit_backend.get_embeddings(), streamlit_backend.get_text_splitter()
+    streamlit_backend.get_tool_models(), streamlit_backend.get_chatbot()
+ready = time.perf_counter()
+
+from langchain_core.messages import HumanMessage
+from bench import FakeSchoolChatModel
+streamlit_backend.get_llm()
+streamlit_backend.use_chat_model(FakeSchoolChatModel())
+streamlit_backend.get_chatbot().invoke({{"messages": [HumanMessage("hello")], "user_session": {{}}, "saved_students": []}})
+answered = time.perf_counter()
+print(json.dumps({{"import": imported - start, "ready": ready - start, "first": answered - start}}))
+"""
+
+
+def bench_startup(args):
+    print(f"\nFresh interpreter per run, median of {args.runs}")
+    print(f"  {'mode':<8} {'import':>9} {'worker ready':>13} {'first response':>15}")
+    for eager in (True, False):
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT.format(eager=eager)],
+                                 capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__) or ".")
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        median = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        print(f"  {'eager' if eager else 'lazy':<8} {median['import'] * 1000:>7.0f}ms {median['ready'] * 1000:>11.0f}ms "
+              f"{median['first'] * 1000:>13.0f}ms")
+
+
+# =============================
+# EMBEDDING CACHE
+# =============================
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embedding model that counts the texts it is asked to embed."""
+
+    latency: float = 0.0
+    texts: int = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def synthetic_document(path, paragraphs):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(paragraphs):
+            f.write(f"Section {i}. " + " ".join(f"rule {i}-{j} of the school handbook" for j in range(40)) + "\n\n")
+
+
+def bench_embeddings(args):
+    import tempfile
+
+    import streamlit_backend
+
+    directory = tempfile.mkdtemp()
+    streamlit_backend.EMBEDDING_CACHE = os.path.join(directory, "embeddings.sqlite")
+    document = os.path.join(directory, "handbook.txt")
+    synthetic_document(document, args.paragraphs)
+
+    print(f"\n{args.paragraphs}-paragraph handbook, {args.latency * 1000:.0f} ms per embedding call")
+    model = CountingEmbeddings(size=1536, latency=args.latency)
+    for label in ("first upload", "same file, another session", "after a restart"):
+        if label == "after a restart":
+            streamlit_backend.use_embeddings(model, "bench")   # fresh cache object on the same file
+        elif streamlit_backend._embeddings is None:
+            streamlit_backend.use_embeddings(model, "bench")
+        streamlit_backend.DOCUMENT_INDEX_DIR = ""
+        streamlit_backend._document_indexes = None
+        before = model.texts
+        start = time.perf_counter()
+        result = streamlit_backend.add_document_directly(document)
+        print(f"  {label:<28} {result['chunks']} chunks, {model.texts - before:>4} embedded, "
+              f"{(time.perf_counter() - start) * 1000:7.1f} ms")
+
+    before = model.texts
+    for _ in range(args.queries):
+        streamlit_backend.ask_document.invoke({"query": "What does the handbook say about uniforms?"})
+    print(f"  {args.queries} identical queries: {model.texts - before} embedded")
+    print(f"  cache: {streamlit_backend.embedding_cache_stats()}")
+
+
+# =============================
+# DOCUMENT INDEX
+# =============================
+WORKER_INDEX_SCRIPT = """
+import json, os, pickle, time
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+def memory():
+    status = dict(line.split(":", 1) for line in open("/proc/self/status"))
+    return {{k: int(status[k].split()[0]) / 1024 for k in ("RssAnon", "RssFile")}}
+
+embeddings = DeterministicFakeEmbedding(size={size})
+import faiss
+from langchain_community.vectorstores import FAISS
+from document_index import ShardedIndex
+before = memory()
+start = time.perf_counter()
+if {mmap}:
+    index = ShardedIndex({directory!r}, lambda: embeddings)
+    search = index.similarity_search
+else:
+    # Load every shard onto the heap, as FAISS.load_local does
+    stores = []
+    for name in sorted(os.listdir({directory!r})):
+        path = os.path.join({directory!r}, name)
+        with open(os.path.join(path, "docstore.pkl"), "rb") as f:
+            docstore, ids = pickle.load(f)
+        stores.append(FAISS(embeddings, faiss.read_index(os.path.join(path, "index.faiss")), docstore, ids))
+    def search(query, k):
+        vector = embeddings.embed_query(query)
+        scored = [pair for s in stores for pair in s.similarity_search_with_score_by_vector(vector, k=k)]
+        return sorted(scored, key=lambda pair: pair[1])[:k]
+loaded = time.perf_counter()
+search("uniform rules", k=4)
+answered = time.perf_counter()
+after = memory()
+print(json.dumps({{"load": loaded - start, "first": answered - loaded,
+                  "anon": after["RssAnon"] - before["RssAnon"], "file": after["RssFile"] - before["RssFile"]}}))
+"""
+
+
+def bench_document_index(args):
+    import tempfile
+
+    from document_index import ShardedIndex
+
+    directory = tempfile.mkdtemp()
+    model = CountingEmbeddings(size=args.size)
+    index = ShardedIndex(directory, lambda: model)
+    start = time.perf_counter()
+    for shard in range(args.shards):
+        index.add_texts([f"chunk {shard}-{i} of the school handbook" for i in range(args.chunks)])
+    stats = index.stats()
+    print(f"\n{stats['shards']} shards, {stats['vectors']} vectors of {args.size} dims, "
+          f"{stats['bytes_on_disk'] / 1e6:.0f} MB on disk (written in {time.perf_counter() - start:.1f}s)")
+    print(f"A new worker used to start empty and need all {stats['vectors']} chunks embedded again.")
+
+    print(f"\n{args.workers} workers starting at once, median per worker")
+    print(f"  {'mode':<6} {'load':>8} {'first query':>12} {'private MB':>11} {'shared MB':>10}")
+    for mmap in (False, True):
+        script = WORKER_INDEX_SCRIPT.format(size=args.size, mmap=mmap, directory=directory)
+        workers = [subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True,
+                                    cwd=os.path.dirname(__file__) or ".") for _ in range(args.workers)]
+        runs = [json.loads(w.communicate()[0].strip().splitlines()[-1]) for w in workers]
+        median = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        print(f"  {'mmap' if mmap else 'heap':<6} {median['load'] * 1000:>6.0f}ms {median['first'] * 1000:>10.1f}ms "
+              f"{median['anon']:>11.1f} {median['file']:>10.1f}")
+
+
+# =============================
+# INGESTION PIPELINE
+# =============================
+def synthetic_pdf(path, pages, lines=45):
+    """Write a plain multi-page PDF with `lines` lines of handbook text per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        text = "".join(f"({page + 1}.{line} Students must follow rule {line} of section {page + 1} at all times.) Tj T* "
+                       for line in range(lines))
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text}ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 3 0 R >> >> >>" % len(objects))
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+INGEST_SCRIPT = """
+import json, os, resource, time
+import streamlit_backend
+from langchain_core.embeddings import DeterministicFakeEmbedding
+streamlit_backend.EMBEDDING_CACHE = ""
+streamlit_backend.DOCUMENT_INDEX_DIR = {index!r}
+streamlit_backend.use_embeddings(DeterministicFakeEmbedding(size=1536), "bench")
+start = time.perf_counter()
+if {streaming}:
+    chunks = streamlit_backend.add_document_directly({path!r})["chunks"]
+else:
+    # What add_document_directly used to do
+    import PyPDF2
+    from langchain_community.vectorstores import FAISS
+    text = ""
+    with open({path!r}, "rb") as f:
+        for page in PyPDF2.PdfReader(f).pages:
+            text += page.extract_text() or ""
+    texts = streamlit_backend.get_text_splitter().split_text(text)
+    FAISS.from_texts(texts, streamlit_backend.get_embeddings())
+    chunks = len(texts)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "chunks": chunks, "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def bench_ingest(args):
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "prospectus.pdf")
+    synthetic_pdf(path, args.pages)
+    print(f"\n{args.pages}-page synthetic PDF ({os.path.getsize(path) / 1e6:.1f} MB), "
+          f"{os.cpu_count()} CPUs, fake embeddings, fresh process per run")
+    print(f"  {'pipeline':<10} {'chunks':>7} {'time':>9} {'pages/s':>9} {'peak RSS':>10}")
+    for streaming in (False, True):
+        index = tempfile.mkdtemp(dir=directory)
+        out = subprocess.run([sys.executable, "-c", INGEST_SCRIPT.format(streaming=streaming, path=path, index=index)],
+                             capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__) or ".")
+        run = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"  {'streaming' if streaming else 'old':<10} {run['chunks']:>7} {run['seconds']:>8.2f}s "
+              f"{args.pages / run['seconds']:>9.0f} {run['peak_mb']:>8.0f}MB")
+
+
+# =============================
+# DOCUMENT NAMESPACES
+# =============================
+def bench_namespaces(args):
+    import tempfile
+
+    from document_index import IndexNamespaces
+
+    model = CountingEmbeddings(size=1536)
+    directory = tempfile.mkdtemp()
+    indexes = IndexNamespaces(directory, lambda: model, max_bytes=int(args.cap_mb * 1024 * 1024), idle_ttl=3600)
+    indexes.shared.add_texts([f"School policy {i}: uniforms, attendance and exams." for i in range(args.chunks)])
+
+    print(f"\n{args.sessions} sessions each uploading {args.chunks} chunks, private cap {args.cap_mb:.0f} MB")
+    print(f"  {'sessions':>8} {'open':>6} {'private MB':>11} {'evicted':>8} {'query ms':>9}")
+    for session in range(1, args.sessions + 1):
+        sid = f"session-{session}"
+        indexes.private(sid, create=True).add_texts(
+            [f"{sid} notes {i} on the uniform rules" for i in range(args.chunks)])
+        if session % max(1, args.sessions // 5) == 0:
+            start = time.perf_counter()
+            indexes.search("uniform rules", sid)
+            elapsed = time.perf_counter() - start
+            stats = indexes.stats()
+            print(f"  {session:>8} {stats['private_indexes']:>6} {stats['private_bytes'] / 1e6:>11.1f} "
+                  f"{sum(stats['evictions'].values()):>8} {elapsed * 1000:>9.2f}")
+
+    stats = indexes.stats()
+    print(f"  one global index would now hold {(args.sessions + 1) * args.chunks} vectors in every worker; "
+          f"shared {stats['shared_bytes'] / 1e6:.1f} MB + private {stats['private_bytes'] / 1e6:.1f} MB held")
+    start = time.perf_counter()
+    docs = indexes.search("uniform rules", "session-1")
+    print(f"  evicted session-1 reopened from disk in {(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"{sum('session-1 ' in d.page_content for d in docs)} of {len(docs)} results its own")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fiona backend benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("async-tools", help="async pooled tools vs the old blocking session")
+    p.add_argument("--sessions", type=int, default=50)
+    p.add_argument("--workers", type=int, default=8, help="threads available to the blocking client")
+    p.add_argument("--latency", type=float, default=0.2)
+    p.set_defaults(func=bench_async_tools)
+
+    p = sub.add_parser("parallel-tools", help="latency of one turn with several tool calls")
+    p.add_argument("--latency", type=float, default=0.5)
+    p.set_defaults(func=bench_parallel_tools)
+
+    p = sub.add_parser("single-flight", help="upstream calls for a burst of identical requests")
+    p.add_argument("--callers", type=int, default=200)
+    p.add_argument("--latency", type=float, default=0.3)
+    p.set_defaults(func=bench_single_flight)
+
+    p = sub.add_parser("resilience", help="adaptive timeouts, retries and circuit breaker under faults")
+    p.add_argument("--cooldown", type=float, default=1.0)
+    p.set_defaults(func=bench_resilience)
+
+    p = sub.add_parser("projection", help="tool-result tokens before and after projection")
+    p.set_defaults(func=bench_projection)
+
+    p = sub.add_parser("load", help="drive chatbot.invoke with a fake chat model and report latency percentiles")
+    p.add_argument("--users", type=int, default=50)
+    p.add_argument("--turns", type=int, default=10)
+    p.add_argument("--latency", type=float, default=0.2, help="mock API latency in seconds")
+    p.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM latency per completion")
+    p.add_argument("--payload-scale", type=int, default=1)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--cold", action="store_true", help="disable result/calendar caches and prefetch")
+    p.add_argument("--no-fast-path", action="store_true", help="send every message through the LLM")
+    p.add_argument("--after-tools", choices=["end", "template", "llm"], default="end",
+                   help="what follows render-only tool results")
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser("ttft", help="time to first token/tool card: invoke vs streaming")
+    p.add_argument("--latency", type=float, default=0.2)
+    p.add_argument("--llm-latency", type=float, default=0.4)
+    p.add_argument("--token-delay", type=float, default=0.03)
+    p.set_defaults(func=bench_ttft)
+
+    p = sub.add_parser("prompt", help="static vs per-session system prompt tokens")
+    p.set_defaults(func=bench_prompt)
+
+    p = sub.add_parser("history", help="prompt tokens with count-based vs token-budget history trimming")
+    p.add_argument("--turns", type=int, default=30)
+    p.add_argument("--budget", type=int, default=6000)
+    p.add_argument("--every", type=int, default=3, help="print every Nth turn")
+    p.set_defaults(func=bench_history)
+
+    p = sub.add_parser("summary", help="prompt size over a long session with and without the rolling summary")
+    p.add_argument("--turns", type=int, default=40)
+    p.add_argument("--latency", type=float, default=0.0)
+    p.add_argument("--every", type=int, default=5, help="print every Nth turn")
+    p.set_defaults(func=bench_summary)
+
+    p = sub.add_parser("checkpoint", help="turn cost with the history re-sent vs kept by a checkpointer")
+    p.add_argument("--turns", type=int, default=30)
+    p.add_argument("--sessions", type=int, default=10)
+    p.set_defaults(func=bench_checkpoint)
+
+    p = sub.add_parser("memory", help="follow-up questions with and without the per-session tool memory")
+    p.add_argument("--chatter", type=int, default=4)
+    p.add_argument("--followups", type=int, default=5)
+    p.add_argument("--history-tokens", type=int, default=300)
+    p.add_argument("--latency", type=float, default=0.2)
+    p.add_argument("--llm-latency", type=float, default=0.3)
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("tool-schemas", help="schema tokens of the logged-in and logged-out tool sets")
+    p.add_argument("--calls", type=int, default=200)
+    p.set_defaults(func=bench_tool_schemas)
+
+    p = sub.add_parser("startup", help="import time and first response in a fresh process, eager vs lazy init")
+    p.add_argument("--runs", type=int, default=5)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("embeddings", help="embedding calls when the same document is ingested again")
+    p.add_argument("--paragraphs", type=int, default=200)
+    p.add_argument("--latency", type=float, default=0.3)
+    p.add_argument("--queries", type=int, default=5)
+    p.set_defaults(func=bench_embeddings)
+
+    p = sub.add_parser("document-index", help="worker start-up with the persisted, memory-mapped index")
+    p.add_argument("--shards", type=int, default=8)
+    p.add_argument("--chunks", type=int, default=5000, help="chunks per shard")
+    p.add_argument("--size", type=int, default=1536, help="embedding dimensions")
+    p.add_argument("--workers", type=int, default=4)
+    p.set_defaults(func=bench_document_index)
+
+    p = sub.add_parser("ingest", help="old vs streaming ingestion of a large synthetic PDF")
+    p.add_argument("--pages", type=int, default=300)
+    p.set_defaults(func=bench_ingest)
+
+    p = sub.add_parser("namespaces", help="private per-session indexes under a memory cap")
+    p.add_argument("--sessions", type=int, default=200)
+    p.add_argument("--chunks", type=int, default=200, help="chunks per session upload")
+    p.add_argument("--cap-mb", type=float, default=16)
+    p.set_defaults(func=bench_namespaces)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+# =============================
+# REVALIDATING CACHE
+# =============================
+class RevalidatingCache:
+    """Process-wide cache for one upstream resource.
+
+    Fresh entries (younger than `ttl`) are served without touching the
+    network. Stale entries (up to `ttl + stale_ttl`) are served immediately
+    while a background refresh runs. Refreshes send If-None-Match /
+    If-Modified-Since when the server gave us an ETag or Last-Modified, so an
+    unchanged resource costs a 304 instead of a full payload.
+    """
+
+    def __init__(self, name, fetch, transform=None, ttl=900.0, stale_ttl=86400.0):
+        self.name = name
+        self.fetch = fetch              # async (headers) -> httpx.Response
+        self.transform = transform      # parsed JSON -> cached value
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.value = None
+        self.fetched_at = 0.0
+        self.etag = None
+        self.last_modified = None
+        self._refresh_task = None
+        self.stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "not_modified": 0, "refreshes": 0}
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    async def get(self):
+        """Return the cached value, refreshing it first or in the background as needed."""
+        if self.value is not None:
+            age = self.age()
+            if age < self.ttl:
+                self.stats["fresh_hits"] += 1
+                return self.value
+            if age < self.ttl + self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                self._start_refresh()
+                return self.value
+
+        self.stats["misses"] += 1
+        # shield: one caller giving up must not cancel the refresh for the others
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self):
+        self.value = None
+        self.fetched_at = 0.0
+        self.etag = None
+        self.last_modified = None
+
+    def _start_refresh(self) -> asyncio.Task:
+        # Concurrent callers share the refresh that is already running
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+            self._refresh_task.add_done_callback(self._log_refresh_error)
+        return self._refresh_task
+
+    def _log_refresh_error(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ {self.name} refresh failed: {task.exception()}")
+
+    async def _refresh(self):
+        headers = {}
+        if self.value is not None:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+
+        self.stats["refreshes"] += 1
+        try:
+            response = await self.fetch(headers)
+        except Exception:
+            if self.value is not None:
+                return self.value
+            raise
+
+        if response.status_code == 304 and self.value is not None:
+            self.stats["not_modified"] += 1
+            self.fetched_at = time.monotonic()
+            return self.value
+
+        if response.status_code != 200:
+            if self.value is not None:
+                return self.value
+            raise RuntimeError(f"{self.name} returned HTTP {response.status_code}")
+
+        data = response.json()
+        self.value = self.transform(data) if self.transform else data
+        self.fetched_at = time.monotonic()
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        return self.value
+
+
+# =============================
+# BOUNDED LRU CACHE
+# =============================
+class BoundedLRUCache:
+    """LRU cache with a TTL and caps on both entry count and total bytes.
+
+    Entries carry an owner (a student's sid or temp) so everything cached for
+    one student can be dropped at once, e.g. on logout. Safe to use from the
+    API loop and from Streamlit script threads at the same time.
+    """
+
+    def __init__(self, name, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=6 * 3600.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (value, size, owner, expires_at)
+        self._owners = {}               # owner -> set of keys
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.monotonic() > entry[3]:
+                # Expired entries stay until evicted so get_stale() can still
+                # answer while the upstream API is down
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size, owner=None, ttl=None):
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, owner, expires_at)
+            self._bytes += size
+            if owner is not None:
+                self._owners.setdefault(owner, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_stale(self, key):
+        """Return a value even if it has expired (fallback when the API is down)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def invalidate_owner(self, owner) -> int:
+        """Drop every entry cached for `owner`; returns how many were removed."""
+        with self._lock:
+            keys = list(self._owners.get(owner, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        value, size, owner, _ = self._entries.pop(key)
+        self._bytes -= size
+        if owner is not None:
+            keys = self._owners.get(owner)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._owners[owner]
+
+
+# =============================
+# EMBEDDING CACHE
+# =============================
+class EmbeddingCache:
+    """Embedding vectors on local disk, keyed by a hash of model name + text.
+
+    Identical chunks (the same handbook uploaded by many sessions, or again
+    after a restart) and repeated queries are embedded once. Vectors are
+    stored as float32 in SQLite so the file is shared by every worker.
+    """
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.model}\0{text}".encode(), digest_size=16).digest()
+
+    def get_many(self, texts: list) -> list:
+        """Cached vector for each text, or None where it has not been embedded yet."""
+        keys = [self.key(t) for t in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):   # stay under SQLite's variable limit
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch)
+                found.update(rows.fetchall())
+            vectors = [array("f", found[k]).tolist() if k in found else None for k in keys]
+            hits = sum(v is not None for v in vectors)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return vectors
+
+    def put_many(self, texts: list, vectors: list):
+        rows = [(self.key(t), array("f", v).tobytes()) for t, v in zip(texts, vectors)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,277 @@
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+
+# =============================
+# SHARDED FAISS INDEX
+# =============================
+class ShardedIndex:
+    """Uploaded-document index kept on disk as append-only FAISS shards.
+
+    Every ingest becomes a new shard directory (index.faiss + docstore.pkl),
+    written under a temporary name and renamed into place, so nothing already
+    on disk is ever rewritten. Shards are opened read-only and memory-mapped:
+    worker processes share the same page-cache pages and start without
+    re-embedding anything. Shards written by other workers are picked up on
+    the next search. With no directory the shards only live in memory.
+
+    While add_batches() runs, the shard it is building is searchable as soon
+    as each batch is embedded, so a large upload is usable before it finishes.
+    """
+
+    def __init__(self, directory, get_embeddings):
+        self.directory = directory
+        self.get_embeddings = get_embeddings   # called on use, so swapping the model takes effect
+        self._shards = {}                      # shard name -> langchain FAISS store
+        self._pending = {}                     # shard name -> store still being added to
+        self._sizes = {}                       # shard name -> bytes held (vectors + text)
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.refresh()
+
+    def refresh(self) -> int:
+        """Open any shards on disk that this process has not seen yet; returns how many."""
+        if not self.directory:
+            return 0
+        # Shards being written sit in ".<name>.tmp" until renamed into place
+        names = sorted(n for n in os.listdir(self.directory)
+                       if not n.startswith(".") and os.path.isfile(os.path.join(self.directory, n, "docstore.pkl")))
+        with self._lock:
+            new = [n for n in names if n not in self._shards and n not in self._pending]
+            for name in new:
+                self._shards[name] = self._open(name)
+                self._sizes[name] = shard_bytes(self._shards[name])
+        if new:
+            print(f"📂 Opened {len(new)} document index shard(s) from {self.directory}")
+        return len(new)
+
+    def add_texts(self, texts: list, metadatas: list = None) -> str:
+        """Embed `texts` into a new shard and return its name."""
+        from langchain_community.vectorstores import FAISS
+
+        return self._commit(FAISS.from_texts(texts, self.get_embeddings(), metadatas=metadatas))
+
+    def add_batches(self, batches, shard_size: int = 20000, on_batch=None) -> int:
+        """Embed an iterable of text batches as they arrive; returns how many texts were added.
+
+        A shard is written every `shard_size` vectors, so a huge document never
+        holds more than one shard's vectors on the heap. `on_batch(added)` is
+        called once each batch is searchable.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        embeddings = self.get_embeddings()
+        name, added = None, 0
+        try:
+            for texts in batches:
+                vectors = embeddings.embed_documents(texts)   # the slow part, outside the lock
+                with self._lock:
+                    if name is None:
+                        name = self._new_name()
+                        self._pending[name] = FAISS.from_embeddings(zip(texts, vectors), embeddings)
+                    else:
+                        self._pending[name].add_embeddings(zip(texts, vectors))
+                    full = self._pending[name].index.ntotal >= shard_size
+                added += len(texts)
+                if on_batch:
+                    on_batch(added)
+                if full:
+                    self._commit(self._pending[name], name)
+                    name = None
+            if name is not None:
+                self._commit(self._pending[name], name)
+        finally:
+            if name is not None:
+                with self._lock:
+                    self._pending.pop(name, None)
+        return added
+
+    def similarity_search(self, query: str, k: int = 4) -> list:
+        """The k nearest chunks across every shard (embeds the query once)."""
+        if self.is_empty():
+            return []
+        vector = self.get_embeddings().embed_query(query)
+        return [doc for doc, _ in self.search_by_vector(vector, k)]
+
+    def search_by_vector(self, vector: list, k: int = 4) -> list:
+        """(document, L2 distance) for the k nearest chunks, closest first."""
+        scored = []
+        with self._lock:
+            # One snapshot, so a shard moving from pending to committed is seen
+            # exactly once; pending shards are still being added to, search them here
+            shards = list(self._shards.values())
+            for store in self._pending.values():
+                scored.extend(store.similarity_search_with_score_by_vector(vector, k=k))
+        for store in shards:
+            scored.extend(store.similarity_search_with_score_by_vector(vector, k=k))
+        scored.sort(key=lambda pair: pair[1])   # L2 distance, smaller is closer
+        return scored[:k]
+
+    def is_empty(self) -> bool:
+        self.refresh()
+        with self._lock:
+            return not self._shards and not self._pending
+
+    def nbytes(self) -> int:
+        """Approximate bytes held: vectors (mapped or on the heap) plus chunk text."""
+        with self._lock:
+            return sum(self._sizes.values()) + sum(shard_bytes(store) for store in self._pending.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            shards = list(self._shards.items())
+        size = 0
+        if self.directory:
+            size = sum(os.path.getsize(os.path.join(self.directory, name, f))
+                       for name, _ in shards for f in ("index.faiss", "docstore.pkl"))
+        with self._lock:
+            pending = sum(store.index.ntotal for store in self._pending.values())
+        return {
+            "shards": len(shards),
+            "vectors": sum(store.index.ntotal for _, store in shards),
+            "pending_vectors": pending,
+            "bytes_on_disk": size,
+        }
+
+    def _new_name(self) -> str:
+        return f"{time.time_ns():020d}-{os.getpid()}-{threading.get_ident()}"
+
+    def _commit(self, store, name: str = None) -> str:
+        name = name or self._new_name()
+        if self.directory:
+            self._write(name, store)
+            store = self._open(name)   # drop the heap copy, serve from the mapped file
+        size = shard_bytes(store)
+        with self._lock:
+            self._pending.pop(name, None)
+            self._shards[name] = store
+            self._sizes[name] = size
+        return name
+
+    def _write(self, name: str, store):
+        import faiss
+
+        temp = os.path.join(self.directory, f".{name}.tmp")
+        os.makedirs(temp)
+        try:
+            faiss.write_index(store.index, os.path.join(temp, "index.faiss"))
+            with open(os.path.join(temp, "docstore.pkl"), "wb") as f:
+                pickle.dump((store.docstore, store.index_to_docstore_id), f)
+            os.rename(temp, os.path.join(self.directory, name))
+        except BaseException:
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+
+    def _open(self, name: str):
+        import faiss
+        from langchain_community.vectorstores import FAISS
+
+        path = os.path.join(self.directory, name)
+        # IO_FLAG_MMAP_IFC maps the flat vectors instead of copying them onto
+        # the heap; such an index must never be added to, hence READ_ONLY
+        index = faiss.read_index(os.path.join(path, "index.faiss"),
+                                 faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        with open(os.path.join(path, "docstore.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)   # written by _write, never user-supplied
+        return FAISS(self.get_embeddings(), index, docstore, index_to_docstore_id)
+
+
+def shard_bytes(store) -> int:
+    text = sum(len(doc.page_content) for doc in store.docstore._dict.values())
+    return store.index.ntotal * store.index.d * 4 + text
+
+
+# =============================
+# NAMESPACES
+# =============================
+class IndexNamespaces:
+    """A shared school-wide index plus a private index per session.
+
+    Queries search the session's private index and the shared one and merge
+    the results. Private indexes are closed once idle for `idle_ttl` seconds,
+    and least-recently-used ones are closed while together they hold more
+    than `max_bytes`. With a directory they live under <directory>/sessions
+    and reopen (memory-mapped, nothing re-embedded) when the session comes
+    back; without one a closed private index is gone.
+    """
+
+    def __init__(self, directory, get_embeddings, max_bytes=256 * 1024 * 1024, idle_ttl=3600.0):
+        self.directory = directory
+        self.get_embeddings = get_embeddings
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.shared = ShardedIndex(directory, get_embeddings)
+        self._private = OrderedDict()   # session key -> [ShardedIndex, last used], least recent first
+        self._lock = threading.Lock()
+        self.evictions = {"idle": 0, "lru": 0}
+
+    def private(self, session_id: str, create: bool = False):
+        """The session's private index, reopened or created as needed; None if it has none."""
+        if not session_id:
+            return None
+        key = hashlib.blake2b(str(session_id).encode(), digest_size=16).hexdigest()   # safe as a directory name
+        path = os.path.join(self.directory, "sessions", key) if self.directory else ""
+        with self._lock:
+            entry = self._private.get(key)
+            if entry is None:
+                if not create and not (path and os.path.isdir(path)):
+                    return None
+                entry = [ShardedIndex(path, self.get_embeddings), 0.0]
+                self._private[key] = entry
+            entry[1] = time.monotonic()
+            self._private.move_to_end(key)
+        self.evict()
+        return entry[0]
+
+    def search(self, query: str, session_id: str = None, k: int = 4) -> list:
+        """The k nearest chunks from the shared index and the session's private one."""
+        indexes = [index for index in (self.shared, self.private(session_id)) if index and not index.is_empty()]
+        if not indexes:
+            return []
+        vector = self.get_embeddings().embed_query(query)
+        scored = [pair for index in indexes for pair in index.search_by_vector(vector, k)]
+        scored.sort(key=lambda pair: pair[1])
+        return [doc for doc, _ in scored[:k]]
+
+    def evict(self) -> int:
+        """Close idle private indexes, then LRU ones until under max_bytes; returns how many closed."""
+        now = time.monotonic()
+        closed = []
+        with self._lock:
+            for key, (index, last_used) in list(self._private.items()):
+                if now - last_used > self.idle_ttl:
+                    closed.append((key, "idle"))
+            for key, _ in closed:
+                del self._private[key]
+            sizes = {key: entry[0].nbytes() for key, entry in self._private.items()}
+            total = sum(sizes.values())
+            for key in list(self._private):   # least recently used first
+                if total <= self.max_bytes or len(self._private) == 1:
+                    break
+                del self._private[key]
+                total -= sizes[key]
+                closed.append((key, "lru"))
+            for _, reason in closed:
+                self.evictions[reason] += 1
+        for key, reason in closed:
+            print(f"🧹 Closed private document index {key[:8]} ({reason})")
+        return len(closed)
+
+    def stats(self) -> dict:
+        self.evict()
+        with self._lock:
+            private = [entry[0] for entry in self._private.values()]
+            evictions = dict(self.evictions)
+        return {
+            "shared_bytes": self.shared.nbytes(),
+            "private_indexes": len(private),
+            "private_bytes": sum(index.nbytes() for index in private),
+            "max_bytes": self.max_bytes,
+            "evictions": evictions,
+        }
@@ -0,0 +1,173 @@
+import io
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Kept free of langchain and the backend so pool workers start quickly
+
+# =============================
+# CONFIG
+# =============================
+PDF_WORKERS = int(os.getenv("FIONA_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_TASK = 16
+PARALLEL_MIN_PAGES = 32        # below this, starting the pool costs more than it saves
+TEXT_BLOCK_CHARS = 64 * 1024   # .txt/.docx text handed to the splitter at a time
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Process pool for PDF text extraction, started on the first large PDF."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+
+            # spawn, not fork: this process runs the API loop and Streamlit threads
+            _pool = ProcessPoolExecutor(PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            print(f"✅ PDF extraction pool started ({PDF_WORKERS} processes)")
+    return _pool
+
+
+# =============================
+# EXTRACTION
+# =============================
+_reader = (None, None)   # (path, mtime), PdfReader - a pool process reuses it across tasks
+
+
+def extract_pdf_pages(path: str, start: int, stop: int) -> list:
+    """Text of pages [start, stop) of a PDF (runs in a pool process)."""
+    global _reader
+    import PyPDF2
+
+    key = (path, os.stat(path).st_mtime_ns)
+    if _reader[0] != key:
+        _reader = (key, PyPDF2.PdfReader(path))
+    pages = _reader[1].pages
+    return [pages[i].extract_text() or "" for i in range(start, min(stop, len(pages)))]
+
+
+def iter_pdf_pages(path: str, on_progress=None):
+    """Yield page texts in order; large PDFs are extracted by the pool a few tasks ahead."""
+    import PyPDF2
+
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        pages = len(reader.pages)
+        if pages < PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+            for done, page in enumerate(reader.pages, 1):
+                yield page.extract_text() or ""
+                if on_progress:
+                    on_progress(done, pages)
+            return
+
+    # A bounded window of tasks keeps memory flat when embedding is slower than extraction
+    pool = get_pdf_pool()
+    starts = iter(range(0, pages, PAGES_PER_TASK))
+    window = deque()
+    try:
+        for start in starts:
+            window.append(pool.submit(extract_pdf_pages, path, start, start + PAGES_PER_TASK))
+            if len(window) >= PDF_WORKERS * 2:
+                break
+        done = 0
+        while window:
+            texts = window.popleft().result()
+            start = next(starts, None)
+            if start is not None:
+                window.append(pool.submit(extract_pdf_pages, path, start, start + PAGES_PER_TASK))
+            for text in texts:
+                yield text
+                done += 1
+                if on_progress:
+                    on_progress(done, pages)
+    finally:
+        for future in window:
+            future.cancel()
+
+
+def iter_docx_blocks(path: str, on_progress=None):
+    import docx
+
+    paragraphs = docx.Document(path).paragraphs
+    block, size = [], 0
+    for done, paragraph in enumerate(paragraphs, 1):
+        block.append(paragraph.text)
+        size += len(paragraph.text)
+        if size >= TEXT_BLOCK_CHARS or done == len(paragraphs):
+            yield "\n".join(block)
+            block, size = [], 0
+            if on_progress:
+                on_progress(done, len(paragraphs))
+
+
+def iter_text_blocks(path: str, on_progress=None):
+    total = os.path.getsize(path)
+    with open(path, "rb") as f:
+        text = io.TextIOWrapper(f, encoding="utf-8")
+        while True:
+            block = text.read(TEXT_BLOCK_CHARS)
+            if not block:
+                return
+            yield block
+            if on_progress:
+                on_progress(f.tell(), total)
+
+
+def iter_document_text(path: str, on_progress=None):
+    """Yield a document's text in pieces (pages or blocks); None if the type is unsupported.
+
+    `on_progress(done, total)` is called after each piece has been consumed.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        return iter_pdf_pages(path, on_progress)
+    if extension == ".docx":
+        return iter_docx_blocks(path, on_progress)
+    if extension == ".txt":
+        return iter_text_blocks(path, on_progress)
+    return None
+
+
+# =============================
+# CHUNKING
+# =============================
+def iter_chunks(pieces, splitter, min_chars: int = 16 * 1024):
+    """Split text pieces as they arrive.
+
+    Pieces are gathered until there are `min_chars` to split. The last chunk
+    is held back and split again with the next text, so chunks still run
+    across page boundaries while only a few pages are in memory at a time.
+    The result equals splitting "\n".join(pieces) when everything fits in
+    one buffer. Otherwise chunk boundaries near each buffer boundary can
+    shift, so the count can differ from a single split by up to one chunk
+    per buffer, in either direction.
+    """
+    buffer, size = [], 0
+    for piece in pieces:
+        if not piece.strip():
+            continue
+        buffer.append(piece)
+        size += len(piece)
+        if size < min_chars:
+            continue
+        chunks = splitter.split_text("\n".join(buffer))
+        carry = chunks.pop() if chunks else ""
+        buffer, size = [carry], len(carry)
+        yield from chunks
+    if buffer:
+        yield from splitter.split_text("\n".join(buffer))
+
+
+def batched(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,216 @@
+"""Local stand-in for the ezedu school API.
+
+Run it with `python mock_api.py --port 8765 --latency 0.2` and point the
+backend at it with EZEDU_API_BASE=http://127.0.0.1:8765. Faults can be
+injected with --error-rate (HTTP 500s) and --hang-rate/--hang (requests
+that stall long enough to hit client timeouts). --payload-scale multiplies
+the number of subjects, notes and documents in every response, and
+--endpoint-latency getTermResult=0.8 overrides the latency of one endpoint.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# =============================
+# SAMPLE PAYLOADS
+# =============================
+SUBJECTS = ["Bangla", "English", "Mathematics", "Science", "Bangladesh Studies", "ICT", "Religion", "Arts"]
+
+
+def subjects(scale=1):
+    if scale <= 1:
+        return SUBJECTS
+    return [f"{s} {n + 1}" if n else s for n in range(scale) for s in SUBJECTS]
+
+
+def term_result(sid, term, scale=1):
+    result = []
+    for i, subject in enumerate(subjects(scale)):
+        mark = 60 + (i * 7 + int(term or 1) * 3) % 40
+        result.append({
+            "sub_name": subject,
+            "sub_code": f"{100 + i}",
+            "cq_mark": str(mark - 20),
+            "mcq_mark": "20",
+            "total_mark": str(mark),
+            "grade": "A+" if mark >= 80 else "A" if mark >= 70 else "A-",
+            "grade_point": "5.00" if mark >= 80 else "4.00" if mark >= 70 else "3.50",
+            "highest_mark": "98",
+        })
+    return {"sid": sid, "term": term, "result": result, "grandTotal": str(sum(int(r["total_mark"]) for r in result)), "gpa": "4.63"}
+
+
+def unit_test_result(sid, term, scale=1):
+    return [{"sub_name": s, "ct_mark": str(10 + i % 10), "ct_no": "1", "term": term} for i, s in enumerate(subjects(scale))]
+
+
+def diary(entry_date, scale=1):
+    return [{
+        "entry_date": entry_date,
+        "class_name": "Grade 5",
+        "note": [{"subject": s, "cw": f"{s} chapter {i + 1} exercise", "hw": f"Revise {s} chapter {i + 1}", "status": "1"}
+                 for i, s in enumerate(subjects(scale)[:5 * scale])],
+    }]
+
+
+def syllabus(scale=1):
+    return [{"wsTitle": f"{s} Syllabus", "fileName": f"{s.lower().replace(' ', '_')}.pdf",
+             "fileUrl": f"https://example.invalid/uploads/syllabus/{i}.pdf"} for i, s in enumerate(subjects(scale))]
+
+
+def worksheets(entry_date, scale=1):
+    return [{"wsTitle": f"{s} Worksheet", "wsDate": entry_date, "subject": s,
+             "fileUrl": f"https://example.invalid/uploads/worksheet/{i}.pdf"} for i, s in enumerate(subjects(scale)[:3 * scale])]
+
+
+def calendar():
+    return [{"calender_name": "Academic Calendar 2026", "file_location": "calendar_2026.pdf"},
+            {"calender_name": "Exam Routine", "file_location": "exam_routine.pdf"}]
+
+
+# =============================
+# SERVER
+# =============================
+class MockState:
+    def __init__(self, latency=0.0, error_rate=0.0, hang_rate=0.0, hang=30.0, payload_scale=1, endpoint_latency=None):
+        self.latency = latency
+        self.endpoint_latency = dict(endpoint_latency or {})
+        self.payload_scale = payload_scale
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.hits = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint):
+        with self.lock:
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, validators=False):
+        raw = json.dumps(body).encode()
+        etag = f'"{hashlib.sha1(raw).hexdigest()}"'
+        if validators and status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        if validators:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode() if length else ""
+        return {k: v[0] for k, v in parse_qs(raw).items()}
+
+    def _route(self, form):
+        path = urlparse(self.path).path
+        if path == "/__stats":
+            with self.state.lock:
+                return 200, dict(self.state.hits)
+
+        endpoint = path.rsplit("/", 1)[-1]
+        self.state.record(endpoint)
+        latency = self.state.endpoint_latency.get(endpoint, self.state.latency)
+        if latency:
+            time.sleep(latency)
+        if self.state.hang_rate and random.random() < self.state.hang_rate:
+            time.sleep(self.state.hang)
+        if self.state.error_rate and random.random() < self.state.error_rate:
+            return 500, {"error": "injected failure"}
+
+        if endpoint == "studentLogin":
+            if form.get("pass") == "wrong":
+                return 200, {"code": 0, "message": "Invalid credentials"}
+            sid = form.get("id", "1001")
+            return 200, {"code": 1, "data": {"sid": sid, "name": f"Student {sid}", "temp": f"T{sid}"}}
+        scale = self.state.payload_scale
+        if endpoint == "getTermResult":
+            return 200, term_result(form.get("sid"), form.get("term"), scale)
+        if endpoint == "getUnitTestResult":
+            return 200, unit_test_result(form.get("sid"), form.get("term"), scale)
+        if endpoint == "getDiary":
+            return 200, diary(form.get("entry_date"), scale)
+        if endpoint == "getSyllabus":
+            return 200, syllabus(scale)
+        if endpoint == "worksheetList":
+            return 200, worksheets(form.get("entry_date"), scale)
+        if endpoint == "getCalender":
+            return 200, calendar()
+        return 404, {"error": "not found"}
+
+    def do_GET(self):
+        self._send(*self._route({}), validators=True)
+
+    def do_POST(self):
+        self._send(*self._route(self._form()))
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def handle_error(self, request, client_address):
+        # Clients that time out on a hung request close the socket under us
+        pass
+
+
+def start_mock_server(port=0, latency=0.0, error_rate=0.0, hang_rate=0.0, hang=30.0,
+                      payload_scale=1, endpoint_latency=None):
+    """Start the mock API in a daemon thread and return (server, base_url).
+
+    Latency, fault and payload settings live on server.state and can be
+    changed while it runs.
+    """
+    state = MockState(latency, error_rate, hang_rate, hang, payload_scale, endpoint_latency)
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+    server = MockServer(("127.0.0.1", port), handler)
+    server.state = handler.state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the ezedu school API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every API call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with HTTP 500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction of calls that stall for --hang seconds")
+    parser.add_argument("--hang", type=float, default=30.0)
+    parser.add_argument("--payload-scale", type=int, default=1, help="multiply subjects/notes/documents per response")
+    parser.add_argument("--endpoint-latency", action="append", default=[], metavar="ENDPOINT=SECONDS",
+                        help="override --latency for one endpoint (repeatable)")
+    args = parser.parse_args()
+
+    endpoint_latency = {}
+    for item in args.endpoint_latency:
+        endpoint, _, seconds = item.partition("=")
+        endpoint_latency[endpoint] = float(seconds)
+
+    server, base_url = start_mock_server(args.port, args.latency, args.error_rate, args.hang_rate, args.hang,
+                                         args.payload_scale, endpoint_latency)
+    print(f"✅ Mock ezedu API listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -4,14 +4,14 @@ import tempfile
 import uuid
 
 import streamlit as st
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
-from streamlit_backend import add_document_directly, chatbot
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from api_client import iterate_async
+from streamlit_backend import get_chatbot, ingest_status, invalidate_student, submit_document, thread_config
 
 # =============================
 # CONFIG
 # =============================
 MAX_MESSAGES_TO_DISPLAY = 15
-MAX_MESSAGES_TO_LLM = 8
 
 # =============================
 # PAGE CONFIG
@@ -150,8 +150,11 @@ st.markdown("""
 # =============================
 # SESSION STATE
 # =============================
+# The session id is also the graph's checkpoint thread, and it lives in the
+# URL so a browser refresh or a server restart picks the conversation up again
 if 'session_id' not in st. session_state:
-    st.session_state.session_id = str(uuid. uuid4())
+    st.session_state.session_id = st.query_params.get('session') or str(uuid. uuid4())
+st.query_params['session'] = st.session_state.session_id
 
 if 'messages' not in st.session_state:
     st.session_state. messages = []
@@ -168,6 +171,96 @@ if 'uploaded_docs' not in st. session_state:
 if 'shown_login_success' not in st. session_state:
     st.session_state.shown_login_success = False
 
+if 'prompt_metrics' not in st.session_state:
+    st.session_state.prompt_metrics = {}
+
+
+def tool_data_from_message(msg):
+    """The full payload for the renderers; content is only the LLM's compact view."""
+    if isinstance(msg.artifact, dict):
+        return msg.artifact
+    try:
+        return json.loads(msg. content)
+    except:
+        return {"error": "Failed to parse response"}
+
+
+def data_owner(args: dict):
+    """The student a tool call fetched data for (None for public tools)."""
+    owner = args.get('temp') or args.get('sid') or args.get('student_id')
+    return str(owner) if owner else None
+
+
+def student_ids(user: dict) -> set:
+    return {str(user[k]) for k in ('sid', 'temp') if user.get(k)}
+
+
+def restore_conversation(user=None):
+    """Rebuild the chat after a restart from the graph's checkpoint for this session.
+
+    The session id is in the URL, and a link alone must not show anyone's
+    results or log anyone in. A thread that holds data of students other
+    than `user` is parked and the visitor gets a fresh one; it comes back
+    once its student logs in again (see unlock_thread).
+    """
+    saved = get_chatbot().get_state(thread_config(st.session_state.session_id)).values
+    if not saved:
+        return
+    owners, messages = {}, []
+    for msg in saved.get('messages', []):
+        if isinstance(msg, HumanMessage):
+            messages.append({"role": "user", "content": msg.content})
+        elif isinstance(msg, ToolMessage):
+            messages.append({"role": "tool", "data": tool_data_from_message(msg)})
+        elif isinstance(msg, AIMessage):
+            owners.update((call['id'], data_owner(call['args'])) for call in msg.tool_calls)
+            if msg.content:
+                messages.append({"role": "assistant", "content": msg.content})
+    students = {owner for owner in owners.values() if owner}
+    if not students <= student_ids(user or {}):
+        st.session_state.locked_thread = {'id': st.session_state.session_id, 'students': students}
+        st.session_state.session_id = str(uuid.uuid4())
+        st.query_params['session'] = st.session_state.session_id
+        return
+    st.session_state.prompt_metrics = saved.get('prompt_metrics') or {}
+    st.session_state.messages = messages
+
+
+def unlock_thread(user: dict):
+    """Switch back to the parked thread if it only holds this student's data."""
+    locked = st.session_state.get('locked_thread')
+    if not locked or not locked['students'] <= student_ids(user):
+        return
+    st.session_state.locked_thread = None
+    st.session_state.session_id = locked['id']
+    st.query_params['session'] = locked['id']
+    st.session_state.messages = []
+    restore_conversation(user)
+
+
+def start_new_chat():
+    """Switch to a fresh checkpoint thread with an empty chat."""
+    st.session_state.messages = []
+    st.session_state.prompt_metrics = {}
+    # Uploads live in the old session's private index, so they go with it
+    st.session_state.uploaded_docs = []
+    st.session_state.session_id = str(uuid.uuid4())
+    st.query_params['session'] = st.session_state.session_id
+    st.session_state.shown_login_success = False
+    st.session_state.locked_thread = None
+
+
+# Each turn sends only the new message, so the conversation has to live in
+# the checkpointer; a stateless graph would answer every turn without history
+if get_chatbot().checkpointer is None:
+    st.error("FIONA_CHECKPOINTER=none is for benchmarks only. Use sqlite or memory to run the app.")
+    st.stop()
+
+if 'restored' not in st.session_state:
+    st.session_state.restored = True
+    if not st.session_state.messages:
+        restore_conversation()
+
 # =============================
 # HELPER FUNCTIONS
 # =============================
@@ -332,8 +425,16 @@ def render_homework(data):
         return
 
     st.markdown("### 📝 Homework")
+    if data.get('start') and data.get('start') != data.get('end'):
+        st.caption(f"📅 {data['start']} → {data['end']}")
+    if data.get('failed_dates'):
+        st.warning(f"⚠️ Could not load: {', '.join(data['failed_dates'])}")
+
+    multi_day = len({e.get('entry_date') for e in entries}) > 1
 
     for entry in entries:
+        if multi_day and entry.get('entry_date'):
+            st.markdown(f"#### 📅 {entry['entry_date']}")
         for n in entry.get('note', []):
             subject = n.get('subject', 'N/A')
             cw = n.get('cw', ''). strip()
@@ -387,6 +488,10 @@ def render_worksheet(data):
         return
 
     st.markdown("### 📄 Worksheets")
+    if data.get('start') and data.get('start') != data.get('end'):
+        st.caption(f"📅 {data['start']} → {data['end']}")
+    if data.get('failed_dates'):
+        st.warning(f"⚠️ Could not load: {', '.join(data['failed_dates'])}")
 
     for d in docs:
         title = d. get('wsTitle') or d.get('title') or d. get('subject') or 'Worksheet'
@@ -493,9 +598,7 @@ with st.sidebar:
     st.markdown("---")
 
     if st.button("➕ New Chat", use_container_width=True):
-        st.session_state.messages = []
-        st.session_state.session_id = str(uuid.uuid4())
-        st.session_state.shown_login_success = False
+        start_new_chat()
         st.rerun()
 
     st.markdown("---")
@@ -506,8 +609,14 @@ with st.sidebar:
         st.success(f"✅ {user. get('name', 'Student')}")
         st.caption(f"ID: {user.get('sid', 'N/A')}")
         if st.button("🚪 Logout", use_container_width=True):
+            invalidate_student(user.get('sid'), user.get('temp'))
+            # Clear the login in the checkpoint too, then leave the thread: its
+            # messages hold the student's results and its id is in the URL
+            get_chatbot().update_state(thread_config(st.session_state.session_id),
+                                       {'user_session': {}, 'saved_students': []})
             st.session_state.user_session = {}
-            st. session_state.shown_login_success = False
+            st.session_state.saved_students = []
+            start_new_chat()
             st.rerun()
     else:
         st. info("🔐 Login করুন")
@@ -529,23 +638,42 @@ with st.sidebar:
                 tmp.write(uploaded_file.getvalue())
                 tmp_path = tmp. name
 
-            with st.spinner(f"Processing... "):
-                result = add_document_directly(tmp_path)
-
-                if result.get('status') == 'success':
-                    st.session_state.uploaded_docs.append({
-                        'name': uploaded_file. name,
-                        'path': tmp_path,
-                        'chunks': result.get('chunks', 0)
-                    })
-                    st.success(f"✅ Added!")
-                else:
-                    st.error(f"❌ Failed")
+            # Ingested in the background into this session's private index;
+            # the chat keeps working meanwhile
+            st.session_state.uploaded_docs.append({
+                'name': uploaded_file. name,
+                'path': tmp_path,
+                'job_id': submit_document(tmp_path, uploaded_file.name, st.session_state.session_id)
+            })
+
+    ingesting = any(
+        (ingest_status(d['job_id']) or {}).get('status') not in ('indexed', 'failed', None)
+        for d in st.session_state.uploaded_docs
+    )
 
-    if st.session_state.uploaded_docs:
+    @st.fragment(run_every=1 if ingesting else None)
+    def document_list():
+        """Poll the ingestion jobs without rerunning the whole page."""
+        if not st.session_state.uploaded_docs:
+            return
         st.markdown("**📚 Documents:**")
+        still_running = False
         for doc in st.session_state.uploaded_docs:
-            st.caption(f"✓ {doc['name']}")
+            job = ingest_status(doc['job_id']) or {'status': 'failed', 'error': 'Lost on restart'}
+            status = job['status']
+            if status == 'indexed':
+                st.caption(f"✓ {doc['name']} ({job['chunks']} chunks)")
+            elif status == 'failed':
+                st.caption(f"❌ {doc['name']}: {job.get('error') or 'Failed'}")
+            else:
+                still_running = True
+                label = {'queued': 'Queued', 'extracting': 'Extracting text', 'chunking': 'Chunking',
+                         'embedding': 'Embedding'}.get(status, status)
+                st.progress(job['percent'] / 100, text=f"{doc['name']}: {label} {job['percent']}%")
+        if ingesting and not still_running:
+            st.rerun()   # stop polling
+
+    document_list()
 
     st.markdown("---")
 
@@ -553,20 +681,24 @@ with st.sidebar:
     st.markdown("### ⚡ Quick Actions")
 
     if st.button("📅 Calendar", use_container_width=True, key="cal_btn"):
-        st. session_state.messages. append({"role": "user", "content": "calendar"})
-        st. rerun()
+        st.session_state.pending_prompt = "calendar"
+        st.rerun()
 
     if st.session_state.user_session.get('sid'):
         if st.button("📊 Results", use_container_width=True, key="res_btn"):
-            st.session_state.messages.append({"role": "user", "content": "আমার result"})
+            st.session_state.pending_prompt = "আমার result"
             st.rerun()
 
         if st.button("📝 Homework", use_container_width=True, key="hw_btn"):
-            st.session_state.messages. append({"role": "user", "content": "আজকের homework"})
+            st.session_state.pending_prompt = "আজকের homework"
             st.rerun()
 
     st.markdown("---")
     st.caption(f"💬 {len(st.session_state.messages)}")
+    metrics = st.session_state.prompt_metrics
+    if metrics:
+        st.caption(f"🔢 {metrics['prompt_tokens']}/{metrics['budget']} prompt tokens · "
+                   f"{metrics['messages_dropped']} older messages dropped")
 
 # =============================
 # MAIN CHAT AREA
@@ -587,18 +719,18 @@ if not st.session_state.messages:
     col1, col2 = st.columns(2)
     with col1:
         if st.button("📅 Calendar", key="q1", use_container_width=True):
-            st.session_state.messages.append({"role": "user", "content": "calendar"})
+            st.session_state.pending_prompt = "calendar"
             st.rerun()
         if st.button("📊 Results", key="q2", use_container_width=True):
-            st.session_state. messages.append({"role": "user", "content": "result"})
+            st.session_state.pending_prompt = "result"
             st.rerun()
     with col2:
         if st. button("📝 Homework", key="q3", use_container_width=True):
-            st. session_state.messages.append({"role": "user", "content": "homework"})
-            st. rerun()
+            st.session_state.pending_prompt = "homework"
+            st.rerun()
         if st.button("📚 Syllabus", key="q4", use_container_width=True):
-            st.session_state.messages.append({"role": "user", "content": "syllabus"})
-            st. rerun()
+            st.session_state.pending_prompt = "syllabus"
+            st.rerun()
 
 # =============================
 # DISPLAY MESSAGES - SMART
@@ -648,67 +780,95 @@ for i, msg in enumerate(recent_messages):
 # =============================
 # CHAT INPUT & PROCESSING
 # =============================
+def record_tool_result(tool_data):
+    """Store a tool result in the chat history and pick up logins."""
+    if tool_data.get('action') == 'login_success':
+        st.session_state.user_session = {
+            'sid': tool_data. get('sid'),
+            'name': tool_data. get('name'),
+            'temp': tool_data.get('temp')
+        }
+        if not any(s. get('sid') == tool_data.get('sid') for s in st.session_state.saved_students):
+            st.session_state. saved_students.append({
+                'sid': tool_data. get('sid'),
+                'name': tool_data.get('name'),
+                'temp': tool_data.get('temp')
+            })
+        unlock_thread(st.session_state.user_session)
+
+    st.session_state. messages.append({
+        "role": "tool",
+        "data": tool_data
+    })
+
 prompt = st.chat_input("আমাকে কিছু জিজ্ঞেস করো...  💬")
 
+# Quick-action buttons queue their message and rerun; it is processed here like typed input
+if not prompt:
+    prompt = st.session_state.pop('pending_prompt', None)
+
 if prompt:
     st.session_state. messages.append({"role": "user", "content": prompt})
-
-    recent_for_llm = get_recent_messages(st. session_state.messages, MAX_MESSAGES_TO_LLM)
-
-    backend_messages = []
-    for m in recent_for_llm:
-        role = m.get('role')
-        content = m.get('content', '')
-        if role == 'user' and content:
-            backend_messages.append(HumanMessage(content=content))
-        elif role == 'assistant' and content:
-            backend_messages.append(AIMessage(content=content))
+    with st.chat_message("user"):
+        st.write(prompt)
 
     try:
+        # The checkpointer already holds the conversation, so only the new
+        # message goes in; login state is owned by the app and sent each turn
         state = {
-            'messages': backend_messages,
+            'messages': [HumanMessage(content=prompt)],
             'user_session': st. session_state.user_session,
             'saved_students': st.session_state.saved_students
         }
 
-        result = chatbot.invoke(state)
-        new_messages = result.get('messages', [])
         added_tool_result = False
+        text_box = None
+        streamed_text = ""
+
+        # Stream on the shared API loop: LLM tokens as they are generated,
+        # tool cards as soon as each ToolMessage arrives
+        # durability="exit": one checkpoint write per turn, not one per step
+        stream = get_chatbot().astream(state, thread_config(st.session_state.session_id),
+                                       stream_mode=["messages", "updates"], durability="exit")
+        for mode, chunk in iterate_async(stream):
+            if mode == "messages":
+                token, metadata = chunk
+                if (metadata.get('langgraph_node') == 'chat_node'
+                        and isinstance(token, AIMessageChunk) and token.content):
+                    if text_box is None:
+                        with st.chat_message("assistant"):
+                            text_box = st.empty()
+                    streamed_text += token.content
+                    text_box.markdown(streamed_text + "▌")
+                continue
 
-        for msg in new_messages[len(backend_messages):]:
-            if isinstance(msg, AIMessage):
-                content = msg.content
-                if content and content.strip():
-                    if not added_tool_result or not should_skip_message(content, None):
-                        st.session_state. messages.append({
-                            "role": "assistant",
-                            "content": content
-                        })
-
-            elif isinstance(msg, ToolMessage):
-                try:
-                    tool_data = json.loads(msg. content)
-                except:
-                    tool_data = {"error": "Failed to parse response"}
-
-                if tool_data.get('action') == 'login_success':
-                    st.session_state.user_session = {
-                        'sid': tool_data. get('sid'),
-                        'name': tool_data. get('name'),
-                        'temp': tool_data.get('temp')
-                    }
-                    if not any(s. get('sid') == tool_data.get('sid') for s in st.session_state.saved_students):
-                        st.session_state. saved_students.append({
-                            'sid': tool_data. get('sid'),
-                            'name': tool_data.get('name'),
-                            'temp': tool_data.get('temp')
-                        })
-
-                st.session_state. messages.append({
-                    "role": "tool",
-                    "data": tool_data
-                })
-                added_tool_result = True
+            for update in chunk.values():
+                if (update or {}).get('prompt_metrics'):
+                    st.session_state.prompt_metrics = update['prompt_metrics']
+                for msg in (update or {}).get('messages', []):
+                    if isinstance(msg, ToolMessage):
+                        tool_data = tool_data_from_message(msg)
+                        record_tool_result(tool_data)
+                        with st.chat_message("assistant"):
+                            render_tool_result(tool_data, len(st.session_state.messages))
+                        added_tool_result = True
+
+                    elif isinstance(msg, AIMessage):
+                        content = msg.content
+                        keep = bool(content and content.strip()) and (
+                            not added_tool_result or not should_skip_message(content, None))
+                        if keep:
+                            st.session_state. messages.append({
+                                "role": "assistant",
+                                "content": content
+                            })
+                        if text_box is not None:
+                            if keep:
+                                text_box.markdown(content)
+                            else:
+                                text_box.empty()
+                        text_box = None
+                        streamed_text = ""
 
     except Exception as e:
         st.session_state.messages. append({
@@ -1,61 +1,233 @@
+import asyncio
+import functools
 import json
-from datetime import datetime, timedelta
+import os
+import queue
+import threading
+import re
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
 from typing import Annotated, TypedDict
 
-import docx
-import PyPDF2
-import requests
-import urllib3
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
-from langchain_core.messages import BaseMessage, SystemMessage
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langgraph.graph import START, StateGraph
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import StructuredTool, tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
-from system_prompt import SYSTEM_PROMPT
+from api_client import API_BASE, UPSTREAM_ERRORS, api_get, api_post, run_async
+from cache import BoundedLRUCache, EmbeddingCache, RevalidatingCache
+from document_index import IndexNamespaces, ShardedIndex
+from document_pipeline import batched, iter_chunks, iter_document_text
+from system_prompt import (
+    LOGGED_IN_SESSION, LOGGED_OUT_SESSION, SAVED_STUDENTS_HEADER, SUMMARY_HEADER, SUMMARY_PROMPT, SYSTEM_PROMPT,
+    TOOL_MEMORY_HEADER,
+)
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 load_dotenv()
 
 # =============================
-# SESSION MANAGEMENT
+# LLM SETUP
 # =============================
-session = requests.Session()
-session.headers.update({
-    'Accept': '*/*',
-    'Content-Type': 'application/x-www-form-urlencoded',
-    'User-Agent': 'Mozilla/5.0'
-})
+# Models and heavy libraries (langchain_openai, FAISS, PyPDF2, python-docx,
+# tiktoken) load on first use, so importing this module - and starting a
+# Streamlit worker - stays cheap. Each is created once per process.
+@functools.lru_cache(maxsize=1)
+def get_llm():
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
+
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_CACHE = os.getenv("FIONA_EMBEDDING_CACHE", "fiona_embeddings.sqlite")   # "" disables it
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that look every text up in the disk EmbeddingCache before calling the model."""
+
+    def __init__(self, embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = dict(zip(unique, self.embeddings.embed_documents(unique)))
+            self.cache.put_many(list(fresh), list(fresh.values()))
+            for i in missing:
+                vectors[i] = fresh[texts[i]]
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        # OpenAI embeds queries and documents the same way, so they share entries
+        return self.embed_documents([text])[0]
+
+
+_embeddings = None
+
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        from langchain_openai import OpenAIEmbeddings
+
+        use_embeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL)
+    return _embeddings
+
+
+def use_embeddings(model, name: str):
+    """Swap the embedding model (benchmarks use a fake one); `name` keys its cache entries."""
+    global _embeddings
+    _embeddings = CachedEmbeddings(model, EmbeddingCache(EMBEDDING_CACHE, name)) if EMBEDDING_CACHE else model
+
+
+def embedding_cache_stats() -> dict:
+    cache = getattr(_embeddings, "cache", None)
+    return cache.stats() if cache is not None else {}
+
+
+@functools.lru_cache(maxsize=1)
+def get_text_splitter():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+
+
+EMBED_BATCH = int(os.getenv("FIONA_EMBED_BATCH", "256"))   # chunks per embedding request
+DOCUMENT_INDEX_DIR = os.getenv("FIONA_INDEX_DIR", "fiona_index")   # "" keeps documents in memory only
+# Private (per-session) indexes are closed when idle or, least recently used
+# first, while together they hold more than this
+PRIVATE_INDEX_MAX_BYTES = int(float(os.getenv("FIONA_PRIVATE_INDEX_MAX_MB", "256")) * 1024 * 1024)
+PRIVATE_INDEX_IDLE = float(os.getenv("FIONA_PRIVATE_INDEX_IDLE", "3600"))
+_document_indexes = None
+
+
+def get_document_indexes() -> IndexNamespaces:
+    """The shared and per-session document indexes; shards on disk are memory-mapped, not re-embedded."""
+    global _document_indexes
+    if _document_indexes is None:
+        _document_indexes = IndexNamespaces(DOCUMENT_INDEX_DIR, get_embeddings,
+                                            PRIVATE_INDEX_MAX_BYTES, PRIVATE_INDEX_IDLE)
+    return _document_indexes
+
 
-API_BASE = "https://ezedu.kcisbd.com"
+def get_document_index(session_id: str = None) -> ShardedIndex:
+    """The session's private index (created on demand), or the shared school-wide one."""
+    indexes = get_document_indexes()
+    return indexes.private(session_id, create=True) if session_id else indexes.shared
+
+
+def document_index_stats() -> dict:
+    return get_document_indexes().stats()
 
-print("✅ Local session created successfully")
 
 # =============================
-# LLM SETUP
+# DATE PARSING
 # =============================
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+DAY_WORDS = {
+    "today": 0, "আজ": 0, "আজকে": 0, "আজকের": 0,
+    "tomorrow": 1, "আগামীকাল": 1, "কাল": 1,
+    "yesterday": -1, "গতকাল": -1,
+}
+WEEK_WORDS = {
+    "this week": 0, "এই সপ্তাহ": 0, "এই সপ্তাহের": 0,
+    "next week": 1, "আগামী সপ্তাহ": 1, "আগামী সপ্তাহের": 1,
+    "last week": -1, "গত সপ্তাহ": -1, "গত সপ্তাহের": -1,
+}
+DATE_FORMATS = ["%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d %B %Y", "%d %b %Y"]
+MAX_RANGE_DAYS = int(os.getenv("FIONA_MAX_RANGE_DAYS", "31"))
+
+
+def parse_date(expression: str, today: date = None) -> date:
+    """Turn "today", "next monday", "2025-01-31" etc. into a date."""
+    today = today or date.today()
+    text = str(expression).strip().lower()
+
+    if text in DAY_WORDS:
+        return today + timedelta(days=DAY_WORDS[text])
+
+    match = re.fullmatch(r"(next|last|this)?\s*(" + "|".join(WEEKDAYS) + r")", text)
+    if match:
+        modifier, weekday = match.groups()
+        if modifier == "this":
+            # Same Monday-Sunday week as "this week", even if the day has passed
+            return today + timedelta(days=WEEKDAYS.index(weekday) - today.weekday())
+        ahead = (WEEKDAYS.index(weekday) - today.weekday()) % 7
+        if modifier == "last":
+            return today - timedelta(days=(7 - ahead) % 7 or 7)
+        if modifier == "next" and ahead == 0:
+            ahead = 7
+        return today + timedelta(days=ahead)
+
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognised date: {expression}")
+
+
+def normalize_entry_date(expression: str) -> str:
+    """YYYY-MM-DD for anything parse_date understands, otherwise the text as given."""
+    try:
+        return parse_date(expression).strftime("%Y-%m-%d")
+    except ValueError:
+        return str(expression)
+
+
+def parse_date_range(start: str, end: str = "", today: date = None) -> tuple:
+    """Turn "this week", or a start and end expression, into (first_day, last_day)."""
+    today = today or date.today()
+    text = str(start).strip().lower()
+
+    if text in WEEK_WORDS and not end:
+        monday = today - timedelta(days=today.weekday()) + timedelta(weeks=WEEK_WORDS[text])
+        return monday, monday + timedelta(days=6)
 
-vector_store = None
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    first = parse_date(start, today)
+    last = parse_date(end, today) if end else first
+    if last < first:
+        first, last = last, first
+    if (last - first).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"Date range is limited to {MAX_RANGE_DAYS} days")
+    return first, last
+
+
+def days_between(first: date, last: date) -> list:
+    return [(first + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((last - first).days + 1)]
 
 
 # =============================
 # TOOLS
 # =============================
-@tool
-def student_login(student_id: str, password: str) -> str:
+def async_tool(coroutine):
+    """Like @tool for a coroutine, but also callable from a sync graph.invoke."""
+    @functools.wraps(coroutine)
+    def run_sync(*args, **kwargs):
+        return run_async(coroutine(*args, **kwargs))
+
+    return StructuredTool.from_function(func=run_sync, coroutine=coroutine)
+
+
+@async_tool
+async def student_login(student_id: str, password: str) -> str:
     """Login a student using their ID and password."""
     try:
-        url = f"{API_BASE}/index.php/Api/studentLogin"
         payload = {"id": str(student_id). strip(), "pass": str(password). strip()}
 
         print(f"\n🔐 LOGIN ATTEMPT: {student_id}")
-        response = session.post(url, data=payload, timeout=10, verify=False)
+        response = await api_post("studentLogin", payload)
 
         if response. status_code != 200:
             return json.dumps({"error": "Login failed", "action": "login_failed"})
@@ -66,6 +238,7 @@ def student_login(student_id: str, password: str) -> str:
 
         student_data = data.get("data", {})
         print(f"✅ LOGIN SUCCESSFUL: {student_data.get('name')}")
+        start_prefetch(student_data.get("sid"), student_data.get("temp"))
 
         return json.dumps({
             "status": "success",
@@ -74,137 +247,184 @@ def student_login(student_id: str, password: str) -> str:
             "name": student_data.get("name"),
             "temp": student_data.get("temp"),
         })
+    except UPSTREAM_ERRORS as e:
+        print(f"❌ Login error: {e}")
+        return json.dumps({"error": SERVICE_UNAVAILABLE, "action": "login_failed", "service_unavailable": True})
     except Exception as e:
         print(f"❌ Login error: {e}")
         return json.dumps({"error": str(e), "action": "login_failed"})
 
 
-@tool
-def get_term_result(sid: str, temp: str, term: str) -> str:
+# Per-student payloads, keyed by (endpoint, sid or temp, term or date).
+# Results change a few times a year; the diary can change during the day.
+student_cache = BoundedLRUCache(
+    "Student data",
+    max_entries=int(os.getenv("FIONA_RESULT_CACHE_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("FIONA_RESULT_CACHE_MB", "64")) * 1024 * 1024,
+    ttl=float(os.getenv("FIONA_RESULT_CACHE_TTL", str(6 * 3600))),
+)
+DIARY_CACHE_TTL = float(os.getenv("FIONA_DIARY_CACHE_TTL", "600"))
+
+SERVICE_UNAVAILABLE = "School server is not responding right now. Please try again in a few minutes."
+
+
+def stale_or_error(cache_key, error: str, **fields) -> str:
+    """Answer from an expired cache entry if we still hold one, else return the error."""
+    data = student_cache.get_stale(cache_key)
+    if data is not None:
+        print(f"⚠️ API unavailable, serving cached data for {cache_key[0]}")
+        return json.dumps({"status": "success", **fields, "data": data, "stale": True})
+    return json.dumps({"error": error, **fields})
+
+
+@async_tool
+async def get_term_result(sid: str, temp: str, term: str) -> str:
     """Fetch term exam results."""
     try:
         if not sid or not temp or sid == "None" or temp == "None":
             return json.dumps({"error": "Please login first", "exam_type": "term", "requires_login": True})
 
-        url = f"{API_BASE}/index.php/Api/getTermResult"
+        cache_key = ("getTermResult", str(sid), str(term))
+        data = student_cache.get(cache_key)
+        if data is not None:
+            print(f"\n📊 TERM RESULT - Term {term} (cached)")
+            return json.dumps({"status": "success", "exam_type": "term", "data": data})
+
         payload = {"sid": str(sid), "temp": str(temp), "term": str(term)}
 
         print(f"\n📊 FETCHING TERM RESULT - Term {term}")
-        response = session.post(url, data=payload, timeout=10, verify=False)
+        response = await api_post("getTermResult", payload, idempotent=True)
 
         if response.status_code != 200:
-            return json.dumps({"error": "Unable to fetch results", "exam_type": "term"})
+            return stale_or_error(cache_key, "Unable to fetch results", exam_type="term")
 
         data = response.json()
         if not data or not data.get("result"):
             return json.dumps({"error": "No results found", "exam_type": "term"})
 
+        student_cache.put(cache_key, data, size=len(response.content), owner=str(sid))
         print(f"✅ Term result fetched")
         return json. dumps({"status": "success", "exam_type": "term", "data": data})
+    except UPSTREAM_ERRORS:
+        return stale_or_error(cache_key, SERVICE_UNAVAILABLE, exam_type="term")
     except Exception as e:
         return json.dumps({"error": str(e), "exam_type": "term"})
 
 
-@tool
-def get_unit_test_result(sid: str, temp: str, term: str) -> str:
+@async_tool
+async def get_unit_test_result(sid: str, temp: str, term: str) -> str:
     """Fetch class test results."""
     try:
         if not sid or not temp or sid == "None" or temp == "None":
             return json.dumps({"error": "Please login first", "exam_type": "unit", "requires_login": True})
 
-        url = f"{API_BASE}/index.php/Api/getUnitTestResult"
+        cache_key = ("getUnitTestResult", str(sid), str(term))
+        data = student_cache.get(cache_key)
+        if data is not None:
+            print(f"\n📝 CLASS TEST - Term {term} (cached)")
+            return json.dumps({"status": "success", "exam_type": "unit", "data": data})
+
         payload = {"sid": str(sid), "temp": str(temp), "term": str(term)}
 
         print(f"\n📝 FETCHING CLASS TEST - Term {term}")
-        response = session. post(url, data=payload, timeout=10, verify=False)
+        response = await api_post("getUnitTestResult", payload, idempotent=True)
 
         if response.status_code != 200:
-            return json. dumps({"error": "Unable to fetch results", "exam_type": "unit"})
+            return stale_or_error(cache_key, "Unable to fetch results", exam_type="unit")
 
         data = response.json()
         if not data:
             return json. dumps({"error": "No results found", "exam_type": "unit"})
 
+        student_cache.put(cache_key, data, size=len(response.content), owner=str(sid))
         print(f"✅ Class test fetched")
         return json.dumps({"status": "success", "exam_type": "unit", "data": data})
+    except UPSTREAM_ERRORS:
+        return stale_or_error(cache_key, SERVICE_UNAVAILABLE, exam_type="unit")
     except Exception as e:
         return json. dumps({"error": str(e), "exam_type": "unit"})
 
 
-@tool
-def get_homework(temp: str, entry_date: str) -> str:
+@async_tool
+async def get_homework(temp: str, entry_date: str) -> str:
     """Fetch homework for a specific date."""
     try:
         if not temp or temp == "None":
             return json.dumps({"error": "Please login first", "exam_type": "homework", "requires_login": True})
 
-        if entry_date. lower() == "today":
-            entry_date = datetime.now(). strftime("%Y-%m-%d")
-        elif entry_date.lower() == "tomorrow":
-            entry_date = (datetime. now() + timedelta(days=1)). strftime("%Y-%m-%d")
-        elif entry_date.lower() == "yesterday":
-            entry_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        entry_date = normalize_entry_date(entry_date)
+
+        cache_key = ("getDiary", str(temp), str(entry_date))
+        data = student_cache.get(cache_key)
+        if data is not None:
+            print(f"\n🏠 HOMEWORK - Date: {entry_date} (cached)")
+            return json.dumps({"status": "success", "exam_type": "homework", "data": data})
 
-        url = f"{API_BASE}/index.php/Api/getDiary"
         payload = {"temp": str(temp), "entry_date": str(entry_date)}
 
         print(f"\n🏠 FETCHING HOMEWORK - Date: {entry_date}")
-        response = session.post(url, data=payload, timeout=10, verify=False)
+        response = await api_post("getDiary", payload, idempotent=True)
 
         if response. status_code != 200:
-            return json.dumps({"error": "Unable to fetch homework", "exam_type": "homework"})
+            return stale_or_error(cache_key, "Unable to fetch homework", exam_type="homework")
 
+        data = response.json()
+        student_cache.put(cache_key, data, size=len(response.content), owner=str(temp), ttl=DIARY_CACHE_TTL)
         print(f"✅ Homework fetched")
-        return json.dumps({"status": "success", "exam_type": "homework", "data": response.json()})
+        return json.dumps({"status": "success", "exam_type": "homework", "data": data})
+    except UPSTREAM_ERRORS:
+        return stale_or_error(cache_key, SERVICE_UNAVAILABLE, exam_type="homework")
     except Exception as e:
         return json.dumps({"error": str(e), "exam_type": "homework"})
 
 
-@tool
-def get_syllabus(temp: str) -> str:
+@async_tool
+async def get_syllabus(temp: str) -> str:
     """Fetch syllabus documents."""
     try:
         if not temp or temp == "None":
             return json.dumps({"error": "Please login first", "type": "syllabus", "requires_login": True})
 
-        url = f"{API_BASE}/index.php/Api/getSyllabus"
+        cache_key = ("getSyllabus", str(temp))
+        data = student_cache.get(cache_key)
+        if data is not None:
+            print(f"\n📚 SYLLABUS (cached)")
+            return json.dumps({"status": "success", "type": "syllabus", "data": data})
+
         payload = {"temp": str(temp)}
 
         print(f"\n📚 FETCHING SYLLABUS")
-        response = session.post(url, data=payload, timeout=10, verify=False)
+        response = await api_post("getSyllabus", payload, idempotent=True)
 
         if response.status_code != 200:
-            return json.dumps({"error": "Unable to fetch syllabus", "type": "syllabus"})
+            return stale_or_error(cache_key, "Unable to fetch syllabus", type="syllabus")
 
         data = response.json()
         if not data:
             return json. dumps({"error": "No syllabus found", "type": "syllabus"})
 
+        student_cache.put(cache_key, data, size=len(response.content), owner=str(temp))
         print(f"✅ Syllabus fetched: {len(data)} documents")
         return json. dumps({"status": "success", "type": "syllabus", "data": data})
+    except UPSTREAM_ERRORS:
+        return stale_or_error(cache_key, SERVICE_UNAVAILABLE, type="syllabus")
     except Exception as e:
         return json.dumps({"error": str(e), "type": "syllabus"})
 
 
-@tool
-def get_worksheet(temp: str, entry_date: str) -> str:
+@async_tool
+async def get_worksheet(temp: str, entry_date: str) -> str:
     """Fetch worksheets for a specific date."""
     try:
         if not temp or temp == "None":
             return json.dumps({"error": "Please login first", "type": "worksheet", "requires_login": True})
 
-        if entry_date. lower() == "today":
-            entry_date = datetime.now().strftime("%Y-%m-%d")
-        elif entry_date.lower() == "tomorrow":
-            entry_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-        elif entry_date.lower() == "yesterday":
-            entry_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        entry_date = normalize_entry_date(entry_date)
 
-        url = f"{API_BASE}/index.php/Api/worksheetList"
         payload = {"temp": str(temp), "entry_date": str(entry_date)}
 
         print(f"\n📄 FETCHING WORKSHEET - Date: {entry_date}")
-        response = session. post(url, data=payload, timeout=10, verify=False)
+        response = await api_post("worksheetList", payload, idempotent=True)
 
         if response.status_code != 200:
             return json. dumps({"error": "Unable to fetch worksheets", "type": "worksheet"})
@@ -215,45 +435,135 @@ def get_worksheet(temp: str, entry_date: str) -> str:
 
         print(f"✅ Worksheets fetched: {len(data)} documents")
         return json.dumps({"status": "success", "type": "worksheet", "data": data})
+    except UPSTREAM_ERRORS:
+        return json.dumps({"error": SERVICE_UNAVAILABLE, "type": "worksheet", "service_unavailable": True})
     except Exception as e:
         return json.dumps({"error": str(e), "type": "worksheet"})
 
 
-@tool
-def get_calendar() -> str:
-    """Fetch academic calendar.  No login required."""
+@async_tool
+async def get_homework_range(temp: str, start: str, end: str = "") -> str:
+    """Fetch homework for every day in a date range in one call.
+
+    start: "this week", "next week", "last week", or a start date ("today", "next monday", "YYYY-MM-DD").
+    end: optional end date in the same formats; leave empty for a single week expression.
+    """
     try:
-        url = f"{API_BASE}/index.php/Api/getCalender"
+        if not temp or temp == "None":
+            return json.dumps({"error": "Please login first", "exam_type": "homework", "requires_login": True})
 
-        print(f"\n📅 FETCHING CALENDAR")
-        response = session.get(url, timeout=10, verify=False)
+        first, last = parse_date_range(start, end)
+        days = days_between(first, last)
+        print(f"\n🏠 FETCHING HOMEWORK - {days[0]} to {days[-1]} ({len(days)} days)")
 
-        if response. status_code != 200:
-            return json.dumps({"error": "Unable to fetch calendar", "type": "calendar"})
+        results = await asyncio.gather(*(get_homework.coroutine(temp, day) for day in days))
+
+        entries, failed, stale = [], [], False
+        for day, raw in zip(days, results):
+            result = json.loads(raw)
+            if result.get("status") != "success":
+                failed.append(day)
+                continue
+            stale = stale or bool(result.get("stale"))
+            for entry in result.get("data") or []:
+                if entry.get("note"):
+                    entries.append({"entry_date": day, **entry})
+
+        if failed and not entries:
+            return json.dumps({"error": "Unable to fetch homework", "exam_type": "homework"})
+
+        entries.sort(key=lambda entry: entry.get("entry_date", ""))
+        print(f"✅ Homework fetched: {len(entries)} days with entries")
+        return json.dumps({"status": "success", "exam_type": "homework", "start": days[0], "end": days[-1],
+                           "data": entries, "failed_dates": failed, **({"stale": True} if stale else {})})
+    except Exception as e:
+        return json.dumps({"error": str(e), "exam_type": "homework"})
+
+
+@async_tool
+async def get_worksheet_range(temp: str, start: str, end: str = "") -> str:
+    """Fetch worksheets for every day in a date range in one call.
+
+    start: "this week", "next week", "last week", or a start date ("today", "next monday", "YYYY-MM-DD").
+    end: optional end date in the same formats; leave empty for a single week expression.
+    """
+    try:
+        if not temp or temp == "None":
+            return json.dumps({"error": "Please login first", "type": "worksheet", "requires_login": True})
+
+        first, last = parse_date_range(start, end)
+        days = days_between(first, last)
+        print(f"\n📄 FETCHING WORKSHEETS - {days[0]} to {days[-1]} ({len(days)} days)")
+
+        results = await asyncio.gather(*(get_worksheet.coroutine(temp, day) for day in days))
+
+        worksheets, failed, stale = [], [], False
+        for day, raw in zip(days, results):
+            result = json.loads(raw)
+            if result.get("status") == "success":
+                stale = stale or bool(result.get("stale"))
+                worksheets.extend({"wsDate": day, **item} for item in result.get("data") or [])
+            elif result.get("error") != "No worksheets found":
+                failed.append(day)
+
+        if not worksheets:
+            error = "Unable to fetch worksheets" if failed else "No worksheets found"
+            return json.dumps({"error": error, "type": "worksheet"})
+
+        worksheets.sort(key=lambda item: item.get("wsDate") or "")
+        print(f"✅ Worksheets fetched: {len(worksheets)} documents")
+        return json.dumps({"status": "success", "type": "worksheet", "start": days[0], "end": days[-1],
+                           "data": worksheets, "failed_dates": failed, **({"stale": True} if stale else {})})
+    except Exception as e:
+        return json.dumps({"error": str(e), "type": "worksheet"})
+
+
+def add_calendar_file_urls(data):
+    for item in data or []:
+        file_location = item.get("file_location", "")
+        item["file_url"] = f"{API_BASE}/uploads/calender/{file_location}"
+    return data
+
+
+# The calendar is the same for every user, so one copy serves the whole process
+calendar_cache = RevalidatingCache(
+    "Calendar",
+    fetch=lambda headers: api_get("getCalender", headers=headers),
+    transform=add_calendar_file_urls,
+    ttl=float(os.getenv("FIONA_CALENDAR_TTL", "900")),
+    stale_ttl=float(os.getenv("FIONA_CALENDAR_STALE_TTL", "86400")),
+)
+
+
+@async_tool
+async def get_calendar() -> str:
+    """Fetch academic calendar.  No login required."""
+    try:
+        print(f"\n📅 FETCHING CALENDAR")
+        data = await calendar_cache.get()
 
-        data = response.json()
         if not data:
             return json.dumps({"error": "No calendar available", "type": "calendar"})
 
-        for item in data:
-            file_location = item.get("file_location", "")
-            item["file_url"] = f"{API_BASE}/uploads/calender/{file_location}"
-
         print(f"✅ Calendar fetched: {len(data)} entries")
         return json.dumps({"status": "success", "type": "calendar", "data": data})
+    except UPSTREAM_ERRORS:
+        return json.dumps({"error": SERVICE_UNAVAILABLE, "type": "calendar", "service_unavailable": True})
     except Exception as e:
         return json.dumps({"error": str(e), "type": "calendar"})
 
 
 @tool
-def ask_document(query: str) -> str:
+def ask_document(query: str, config: RunnableConfig) -> str:
     """Search uploaded documents for answers.  No login required."""
-    global vector_store
-
     try:
         print(f"\n🔍 SEARCHING DOCUMENTS: {query}")
 
-        if vector_store is None:
+        # The graph's thread_id is the Streamlit session: search its own uploads and the shared corpus
+        session_id = (config or {}).get("configurable", {}).get("thread_id")
+        indexes = get_document_indexes()
+        private = indexes.private(session_id)
+        if indexes.shared.is_empty() and (private is None or private.is_empty()):
             print("   ❌ No documents in vector store")
             return json.dumps({
                 "status": "error",
@@ -261,7 +571,7 @@ def ask_document(query: str) -> str:
                 "type": "document_search"
             })
 
-        docs = vector_store. similarity_search(query, k=4)
+        docs = indexes.search(query, session_id, k=4)
 
         if not docs:
             return json.dumps({
@@ -284,54 +594,181 @@ def ask_document(query: str) -> str:
         return json.dumps({"status": "error", "message": str(e), "type": "document_search"})
 
 
+# =============================
+# PREFETCH ON LOGIN
+# =============================
+# After a login the next turns almost always ask for results, today's
+# homework or the syllabus. Warm the student cache in the background by
+# running the same tool coroutines the graph would run.
+PREFETCH_ON_LOGIN = os.getenv("FIONA_PREFETCH_ON_LOGIN", "1") != "0"
+PREFETCH_TERMS = [t.strip() for t in os.getenv("FIONA_PREFETCH_TERMS", "1,2,3,4").split(",") if t.strip()]
+MAX_CONCURRENT_PREFETCHES = int(os.getenv("FIONA_MAX_PREFETCHES", "16"))
+
+_prefetch_slots = asyncio.Semaphore(MAX_CONCURRENT_PREFETCHES)
+_prefetch_tasks = {}
+
+
+async def _prefetch_one(coroutine, *args):
+    async with _prefetch_slots:
+        await coroutine(*args)
+
+
+async def prefetch_student(sid: str, temp: str):
+    jobs = [_prefetch_one(get_term_result.coroutine, sid, temp, term) for term in PREFETCH_TERMS]
+    jobs.append(_prefetch_one(get_homework.coroutine, temp, "today"))
+    jobs.append(_prefetch_one(get_syllabus.coroutine, temp))
+    await asyncio.gather(*jobs)
+    print(f"✅ Prefetched data for SID {sid}")
+
+
+def start_prefetch(sid: str, temp: str):
+    """Start warming the cache for a student (must run on the API loop)."""
+    if not PREFETCH_ON_LOGIN or not sid or not temp:
+        return
+    sid = str(sid)
+    previous = _prefetch_tasks.get(sid)
+    if previous is not None and not previous.done():
+        return
+
+    task = asyncio.ensure_future(prefetch_student(sid, str(temp)))
+    _prefetch_tasks[sid] = task
+    task.add_done_callback(lambda done: _prefetch_tasks.pop(sid, None) if _prefetch_tasks.get(sid) is done else None)
+
+
+async def _forget_student(sid: str, temp: str = None) -> int:
+    task = _prefetch_tasks.pop(sid, None)
+    if task is not None and not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        print(f"🛑 Prefetch cancelled for SID {sid}")
+
+    removed = student_cache.invalidate_owner(sid)
+    if temp:
+        removed += student_cache.invalidate_owner(str(temp))
+    return removed
+
+
+def invalidate_student(sid: str, temp: str = None) -> int:
+    """Cancel any prefetch and forget everything cached for a student (called on logout)."""
+    removed = run_async(_forget_student(str(sid), temp))
+    print(f"🧹 Cleared {removed} cached entries for SID {sid}")
+    return removed
+
+
 # =============================
 # DIRECT DOCUMENT ADD (FOR FRONTEND)
 # =============================
-def add_document_directly(file_path: str) -> dict:
-    """Add document directly to vector store (bypassing LLM)."""
-    global vector_store
+def add_document_directly(file_path: str, on_status=None, session_id: str = None) -> dict:
+    """Add document directly to vector store (bypassing LLM).
+
+    Pages are extracted (large PDFs by a process pool), split and embedded in
+    batches as they arrive, so memory stays flat whatever the document size.
+    `on_status(stage, percent)` is told when the stage changes (extracting,
+    chunking, embedding) and how much of the document has been read. With a
+    session_id the document goes into that session's private index, otherwise
+    into the shared one.
+    """
+    progress = {"stage": "extracting", "read": 0.0}
+
+    def report(stage=None):
+        if stage:
+            progress["stage"] = stage
+        if on_status:
+            on_status(progress["stage"], int(progress["read"] * 100))
+
+    def on_read(done, total):
+        progress["read"] = done / total if total else 1.0
+        if progress["stage"] == "extracting":
+            report("chunking")
+
+    def embedding(batches):
+        for batch in batches:
+            report("embedding")
+            yield batch
 
     try:
         print(f"\n📄 ADDING DOCUMENT DIRECTLY: {file_path}")
+        report()
 
-        if file_path.endswith(".pdf"):
-            text = ""
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader. pages:
-                    text += page.extract_text() or ""
-        elif file_path.endswith(". docx"):
-            doc = docx. Document(file_path)
-            text = "\n".join([p.text for p in doc.paragraphs])
-        elif file_path.endswith(".txt"):
-            with open(file_path, "r", encoding="utf-8") as f:
-                text = f.read()
-        else:
+        pieces = iter_document_text(file_path, on_read)
+        if pieces is None:
             return {"status": "error", "message": "Unsupported file type"}
 
-        if not text. strip():
-            return {"status": "error", "message": "Document is empty"}
+        chunks = iter_chunks(pieces, get_text_splitter())
+        added = get_document_index(session_id).add_batches(embedding(batched(chunks, EMBED_BATCH)),
+                                                 on_batch=lambda added: report())
 
-        chunks = text_splitter.split_text(text)
-
-        print(f"   Text length: {len(text)} chars")
-        print(f"   Split into {len(chunks)} chunks")
-
-        if vector_store is None:
-            vector_store = FAISS.from_texts(chunks, embeddings)
-            print(f"   Created new vector store")
-        else:
-            vector_store.add_texts(chunks)
-            print(f"   Added to existing vector store")
+        if not added:
+            return {"status": "error", "message": "Document is empty"}
 
-        print(f"✅ Document added: {len(chunks)} chunks")
+        print(f"✅ Document added: {added} chunks")
 
-        return {"status": "success", "message": f"Added {len(chunks)} chunks", "chunks": len(chunks)}
+        return {"status": "success", "message": f"Added {added} chunks", "chunks": added}
     except Exception as e:
         print(f"❌ Error: {e}")
         return {"status": "error", "message": str(e)}
 
 
+# =============================
+# INGESTION QUEUE
+# =============================
+# Uploads are ingested one at a time by a background thread so the chat stays
+# responsive; the sidebar polls ingest_status(). Chunks become searchable
+# batch by batch while a job is still running.
+INGEST_JOBS_KEPT = 200
+
+_ingest_queue = queue.Queue()
+_ingest_jobs = OrderedDict()   # job id -> status dict, oldest first
+_ingest_lock = threading.Lock()
+_ingest_worker = None
+
+
+def submit_document(file_path: str, name: str = None, session_id: str = None) -> str:
+    """Queue a document for background ingestion and return its job id."""
+    global _ingest_worker
+
+    job_id = uuid.uuid4().hex
+    job = {"id": job_id, "name": name or os.path.basename(file_path), "status": "queued",
+           "percent": 0, "chunks": 0, "error": None}
+    with _ingest_lock:
+        _ingest_jobs[job_id] = job
+        while len(_ingest_jobs) > INGEST_JOBS_KEPT:
+            _ingest_jobs.popitem(last=False)
+        if _ingest_worker is None:
+            _ingest_worker = threading.Thread(target=_run_ingest_jobs, name="fiona-ingest", daemon=True)
+            _ingest_worker.start()
+    _ingest_queue.put((job_id, file_path, session_id))
+    print(f"📥 Queued {job['name']} for ingestion (job {job_id[:8]})")
+    return job_id
+
+
+def ingest_status(job_id: str) -> dict:
+    """A copy of the job's status: queued, extracting, chunking, embedding, indexed or failed."""
+    with _ingest_lock:
+        job = _ingest_jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+
+def _update_job(job_id: str, **fields):
+    with _ingest_lock:
+        if job_id in _ingest_jobs:
+            _ingest_jobs[job_id].update(fields)
+
+
+def _run_ingest_jobs():
+    while True:
+        job_id, file_path, session_id = _ingest_queue.get()
+        try:
+            result = add_document_directly(
+                file_path, lambda stage, percent: _update_job(job_id, status=stage, percent=percent), session_id)
+            if result.get("status") == "success":
+                _update_job(job_id, status="indexed", percent=100, chunks=result["chunks"])
+            else:
+                _update_job(job_id, status="failed", error=result.get("message"))
+        finally:
+            _ingest_queue.task_done()
+
+
 # =============================
 # BIND TOOLS
 # =============================
@@ -340,12 +777,44 @@ tools = [
     get_term_result,
     get_unit_test_result,
     get_homework,
+    get_homework_range,
     get_syllabus,
     get_worksheet,
+    get_worksheet_range,
     get_calendar,
     ask_document,
 ]
-llm_with_tools = llm.bind_tools(tools)
+# Before login the system prompt forbids every student tool, so logged-out
+# calls only carry these schemas. Both variants are bound once per model.
+PUBLIC_TOOLS = [student_login, get_calendar, ask_document]
+TOOL_VARIANTS = {"logged_in": tools, "logged_out": PUBLIC_TOOLS}
+
+
+def bind_tool_variants(model) -> dict:
+    return {variant: model.bind_tools(variant_tools, parallel_tool_calls=True)
+            for variant, variant_tools in TOOL_VARIANTS.items()}
+
+
+_tool_models = None
+_summary_model = None
+
+
+def get_tool_models() -> dict:
+    global _tool_models
+    if _tool_models is None:
+        _tool_models = bind_tool_variants(get_llm())
+    return _tool_models
+
+
+def get_summary_model():
+    return _summary_model or get_llm()
+
+
+def use_chat_model(model):
+    """Swap the chat model behind chat_node and the summarizer (load tests use a fake model)."""
+    global _tool_models, _summary_model
+    _tool_models = bind_tool_variants(model)
+    _summary_model = model
 
 
 # =============================
@@ -355,74 +824,772 @@ class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
     user_session: dict
     saved_students: list
+    prompt_metrics: dict
+    summary: str
+    tool_memory: dict
 
 
 # =============================
 # CHAT NODE
 # =============================
-def chat_node(state: ChatState) -> ChatState:
-    messages = state["messages"]
-    user_session = state. get("user_session", {})
-    saved_students = state. get("saved_students", [])
-
-    session_name = user_session.get("name") or ""
-    session_sid = user_session. get("sid") or ""
-    session_temp = user_session. get("temp") or ""
-
-    formatted_prompt = SYSTEM_PROMPT.format(
-        name=session_name if session_name else "(Not logged in)",
-        sid=session_sid if session_sid else "(Not logged in)",
-        temp=session_temp if session_temp else "(Not logged in)",
+@functools.lru_cache(maxsize=4096)
+def build_session_prompt(name: str, sid: str, temp: str, saved_students: tuple) -> str:
+    """The small per-session block appended after the static SYSTEM_PROMPT."""
+    if sid and temp:
+        block = LOGGED_IN_SESSION.format(name=name, sid=sid, temp=temp)
+    else:
+        block = LOGGED_OUT_SESSION
+
+    if saved_students:
+        block += SAVED_STUDENTS_HEADER
+        for idx, (saved_name, saved_sid) in enumerate(saved_students, 1):
+            block += f"{idx}. {saved_name} (SID: {saved_sid})\n"
+    return block
+
+
+def session_prompt_for(user_session: dict, saved_students: list) -> str:
+    """The memoized session block for this session state."""
+    user_session = user_session or {}
+    saved = tuple((str(s.get("name")), str(s.get("sid"))) for s in saved_students or [])
+    return build_session_prompt(
+        str(user_session.get("name") or ""),
+        str(user_session.get("sid") or ""),
+        str(user_session.get("temp") or ""),
+        saved,
     )
 
-    if session_sid and session_temp:
-        formatted_prompt += f"""
 
-====================================================
-✅ USER IS LOGGED IN
-====================================================
-Name: {session_name}
-SID: {session_sid}
-TEMP: {session_temp}
+def system_prompt_for(user_session: dict, saved_students: list) -> str:
+    """Static prefix + session block; only the block is memoized, not ~48 KB per session."""
+    return SYSTEM_PROMPT + session_prompt_for(user_session, saved_students)
 
-Use these for tool calls.  DO NOT ask for login again!
-====================================================
-"""
-    else:
-        formatted_prompt += """
 
-====================================================
-❌ USER IS NOT LOGGED IN
-====================================================
-For results/homework/syllabus → Ask for Student ID and Password first!
-====================================================
-"""
+# The system prompt counts against the budget; the current turn is always
+# sent, and older turns are added newest first while they still fit.
+PROMPT_TOKEN_BUDGET = int(os.getenv("FIONA_PROMPT_TOKEN_BUDGET", "8000"))
 
-    if saved_students:
-        formatted_prompt += "\n\n**Previously logged in:**\n"
-        for idx, student in enumerate(saved_students, 1):
-            formatted_prompt += f"{idx}. {student. get('name')} (SID: {student.get('sid')})\n"
 
-    system_message = SystemMessage(content=formatted_prompt)
-    messages_with_system = [system_message] + list(messages)
+def split_turns(messages: list) -> list[list]:
+    """Group messages into turns starting at each HumanMessage, so tool calls stay with their results."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def build_llm_messages(state: ChatState) -> tuple[list[BaseMessage], dict]:
+    """System prompt for the current session plus as much recent history as the token budget allows."""
+    session = session_prompt_for(state.get("user_session", {}), state.get("saved_students", []))
+    if state.get("summary"):
+        session += SUMMARY_HEADER + state["summary"] + "\n"
+    # Reserve room for the whole tool memory; entries whose ToolMessage is
+    # still in the sent history are left out of it below
+    memory = visible_tool_memory(state)
+    memory_reserve = cached_token_count(tool_memory_prompt(memory))
+    system_tokens = MESSAGE_TOKEN_OVERHEAD + static_prompt_tokens() + cached_token_count(session)
+
+    turns = split_turns(list(state["messages"]))
+    kept, history_tokens = [], 0
+    for turn in reversed(turns):
+        tokens = sum(message_tokens(m) for m in turn)
+        if kept and system_tokens + memory_reserve + history_tokens + tokens > PROMPT_TOKEN_BUDGET:
+            break
+        kept.append(turn)
+        history_tokens += tokens
+
+    messages = [m for turn in reversed(kept) for m in turn]
+    sent = {m.id for m in messages}
+    memory_block = tool_memory_prompt([entry for entry in memory if entry["message_id"] not in sent])
+    memory_tokens = cached_token_count(memory_block) if memory_block else 0
+    metrics = {
+        "budget": PROMPT_TOKEN_BUDGET,
+        "system_tokens": system_tokens,
+        "memory_tokens": memory_tokens,
+        "history_tokens": history_tokens,
+        "prompt_tokens": system_tokens + memory_tokens + history_tokens,
+        "messages_sent": len(messages),
+        "messages_dropped": len(state["messages"]) - len(messages),
+    }
+    return [SystemMessage(content=SYSTEM_PROMPT + session + memory_block)] + messages, metrics
+
+
+def with_usage(metrics: dict, reply) -> dict:
+    """Add the provider's own token counts (including prompt-cache hits) when the reply has them."""
+    usage = getattr(reply, "usage_metadata", None) or {}
+    if usage:
+        metrics["input_tokens"] = usage.get("input_tokens")
+        metrics["cached_tokens"] = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        metrics["output_tokens"] = usage.get("output_tokens")
+    print(f"🔢 Prompt: {metrics['prompt_tokens']} tokens ({metrics['messages_sent']} messages, "
+          f"{metrics['messages_dropped']} dropped)")
+    return metrics
+
+
+def tool_variant(state: ChatState) -> str:
+    """Which bound tool set this call gets: "logged_in" or "logged_out"."""
+    session = state.get("user_session") or {}
+    if session.get("sid") and session.get("temp"):
+        return "logged_in"
+    # A login that succeeded earlier in this turn unlocks the student tools right away
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage) and message.name == "student_login" and "login_success" in str(message.content):
+            return "logged_in"
+    return "logged_out"
+
+
+def with_tool_schemas(metrics: dict, variant: str) -> dict:
+    metrics["tool_variant"] = variant
+    metrics["tool_schema_tokens"] = tool_schema_tokens(variant)
+    router_stats["schema_tokens_saved"] += tool_schema_tokens("logged_in") - metrics["tool_schema_tokens"]
+    return metrics
 
-    reply = llm_with_tools.invoke(messages_with_system)
-    return {"messages": [reply]}
+
+def chat_node(state: ChatState) -> ChatState:
+    messages, metrics = build_llm_messages(state)
+    variant = tool_variant(state)
+    start = time.perf_counter()
+    reply = get_tool_models()[variant].invoke(messages)
+    record_llm_latency(time.perf_counter() - start)
+    return {"messages": [reply], "prompt_metrics": with_usage(with_tool_schemas(metrics, variant), reply)}
+
+
+async def achat_node(state: ChatState) -> ChatState:
+    messages, metrics = build_llm_messages(state)
+    variant = tool_variant(state)
+    start = time.perf_counter()
+    reply = await get_tool_models()[variant].ainvoke(messages)
+    record_llm_latency(time.perf_counter() - start)
+    return {"messages": [reply], "prompt_metrics": with_usage(with_tool_schemas(metrics, variant), reply)}
 
 
 # =============================
-# GRAPH
+# CONVERSATION SUMMARY
 # =============================
-tool_node = ToolNode(tools)
+# Once the history passes SUMMARY_TRIGGER_TOKENS, everything but the last
+# SUMMARY_KEEP_TURNS turns is folded into a running summary kept in the
+# state, and the folded messages are removed. Each fold only sends the old
+# summary plus the newly folded messages, so the cost stays flat however
+# long the session runs.
+SUMMARIZE = os.getenv("FIONA_SUMMARIZE", "1") != "0"
+SUMMARY_TRIGGER_TOKENS = int(os.getenv("FIONA_SUMMARY_TRIGGER_TOKENS", "2000"))
+SUMMARY_KEEP_TURNS = int(os.getenv("FIONA_SUMMARY_KEEP_TURNS", "2"))
+SUMMARY_LINE_CHARS = 600
+
+
+def messages_to_fold(state: ChatState) -> list:
+    """The older messages to fold into the summary, or [] while the history is still small."""
+    if not SUMMARIZE:
+        return []
+    turns = split_turns(list(state["messages"]))
+    if len(turns) <= SUMMARY_KEEP_TURNS:
+        return []
+    if sum(message_tokens(m) for m in state["messages"]) <= SUMMARY_TRIGGER_TOKENS:
+        return []
+    return [m for turn in turns[:-SUMMARY_KEEP_TURNS] for m in turn]
+
+
+def summary_request(summary: str, messages: list) -> list[BaseMessage]:
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {message.content}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool {message.name}: {str(message.content)[:SUMMARY_LINE_CHARS]}")
+        elif isinstance(message, AIMessage):
+            calls = ", ".join(call["name"] for call in message.tool_calls)
+            text = str(message.content)[:SUMMARY_LINE_CHARS]
+            lines.append(f"Assistant: {text}" + (f" [called {calls}]" if calls else ""))
+    return [
+        SystemMessage(content=SUMMARY_PROMPT),
+        HumanMessage(content=f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n" + "\n".join(lines)),
+    ]
+
+
+def summary_update(state: ChatState, folded: list, reply) -> ChatState:
+    summary = str(reply.content).strip() or state.get("summary", "")
+    print(f"📝 Folded {len(folded)} messages into the summary ({count_tokens(summary)} tokens)")
+    return {"summary": summary, "messages": [RemoveMessage(id=m.id) for m in folded]}
+
+
+def summarize_node(state: ChatState) -> ChatState:
+    folded = messages_to_fold(state)
+    reply = get_summary_model().invoke(summary_request(state.get("summary", ""), folded))
+    return summary_update(state, folded, reply)
+
+
+async def asummarize_node(state: ChatState) -> ChatState:
+    folded = messages_to_fold(state)
+    reply = await get_summary_model().ainvoke(summary_request(state.get("summary", ""), folded))
+    return summary_update(state, folded, reply)
+
+
+def route_start(state: ChatState) -> str:
+    return "summarize" if messages_to_fold(state) else "router"
 
-graph = StateGraph(ChatState)
-graph.add_node("chat_node", chat_node)
-graph.add_node("tools", tool_node)
 
-graph.add_edge(START, "chat_node")
-graph.add_conditional_edges("chat_node", tools_condition)
-graph.add_edge("tools", "chat_node")
+# =============================
+# INTENT FAST PATH
+# =============================
+# Messages like "calendar", "আজকের homework" or "term 2 result" map to exactly
+# one tool call. The router answers those without the LLM: it emits the tool
+# call itself, and the graph ends after the tool because the frontend renders
+# the result. Every word of the message must be understood; anything else,
+# or a request that needs a login we don't have, goes to the LLM.
+FAST_PATH = os.getenv("FIONA_FAST_PATH", "1") != "0"
+
+INTENT_WORDS = {
+    "calendar": "calendar", "ক্যালেন্ডার": "calendar", "ক্যালেন্ডারটা": "calendar",
+    "syllabus": "syllabus", "সিলেবাস": "syllabus",
+    "homework": "homework", "homeworks": "homework", "diary": "homework",
+    "হোমওয়ার্ক": "homework", "হোমওয়ার্কের": "homework", "ডায়েরি": "homework", "বাড়ির কাজ": "homework",
+    "worksheet": "worksheet", "worksheets": "worksheet", "ওয়ার্কশিট": "worksheet",
+    "result": "term_result", "results": "term_result", "ফলাফল": "term_result", "রেজাল্ট": "term_result",
+    "class test": "unit_test", "unit test": "unit_test", "ct": "unit_test", "ক্লাস টেস্ট": "unit_test",
+}
+TERM_WORDS = {
+    "1": "1", "2": "2", "3": "3", "4": "4", "১": "1", "২": "2", "৩": "3", "৪": "4",
+    "1st": "1", "2nd": "2", "3rd": "3", "4th": "4",
+    "first": "1", "second": "2", "third": "3", "fourth": "4",
+    "প্রথম": "1", "দ্বিতীয়": "2", "তৃতীয়": "3", "চতুর্থ": "4",
+}
+FILLER_WORDS = {
+    "show", "me", "my", "the", "please", "give", "see", "check", "get", "of", "for", "exam",
+    "term", "টার্ম", "টার্মের", "আমার", "দাও", "দেখাও", "দেখান", "দেখতে", "চাই", "প্লিজ", "এর", "পরীক্ষা", "পরীক্ষার",
+}
+LOGIN_INTENTS = {"syllabus", "homework", "worksheet", "term_result", "unit_test"}
+
+router_stats = {"fast_path": 0, "llm": 0, "llm_calls": 0, "llm_calls_saved": 0, "seconds_saved": 0.0,
+                "schema_tokens_saved": 0}
+_llm_latency = None   # moving average of one chat_node LLM call, in seconds
+
+
+def record_llm_latency(seconds: float):
+    global _llm_latency
+    router_stats["llm_calls"] += 1
+    _llm_latency = seconds if _llm_latency is None else 0.8 * _llm_latency + 0.2 * seconds
+
+
+def _words(text: str) -> tuple:
+    # NFC so "য়" typed as one code point or as য + nukta compares equal
+    text = unicodedata.normalize("NFC", str(text).lower())
+    return tuple(re.sub(r"[?!.,।:;'\"()]+", " ", text).split())
+
+
+def _vocabulary() -> dict:
+    """Phrase (tuple of words) -> (slot, value) for every word the router understands."""
+    vocab = {}
+    for phrase, intent in INTENT_WORDS.items():
+        vocab[tuple(phrase.split())] = ("intent", intent)
+    for word, term in TERM_WORDS.items():
+        vocab[(word,)] = ("term", term)
+    for word in FILLER_WORDS:
+        vocab[(word,)] = ("filler", None)
+    for phrase in DAY_WORDS:
+        vocab[tuple(phrase.split())] = ("date", phrase)
+    for phrase in WEEK_WORDS:
+        vocab[tuple(phrase.split())] = ("week", phrase)
+    for weekday in WEEKDAYS:
+        for modifier in ("", "next ", "last ", "this "):
+            vocab[tuple((modifier + weekday).split())] = ("date", modifier + weekday)
+    return {_words(" ".join(phrase)): match for phrase, match in vocab.items()}
+
+
+ROUTER_VOCABULARY = _vocabulary()
+LONGEST_PHRASE = max(len(phrase) for phrase in ROUTER_VOCABULARY)
+
+
+def parse_intent(text: str):
+    """Split a message into {"intent", "term", "date", "week"} slots, or None if any word is unknown."""
+    words = _words(text)
+    slots = {}
+    i = 0
+    while i < len(words):
+        for size in range(min(LONGEST_PHRASE, len(words) - i), 0, -1):
+            match = ROUTER_VOCABULARY.get(tuple(words[i:i + size]))
+            if match is None and size == 1 and re.fullmatch(r"\d{4}-\d{2}-\d{2}", words[i]):
+                match = ("date", words[i])
+            if match is not None:
+                break
+        else:
+            return None
+        slot, value = match
+        if slot != "filler":
+            if slots.get(slot, value) != value:
+                return None   # two different intents, terms or dates
+            slots[slot] = value
+        i += size
+    return slots if "intent" in slots else None
+
+
+def route_intent(text: str, user_session: dict):
+    """The tool calls that answer `text` for this session, or None to ask the LLM."""
+    slots = parse_intent(text)
+    if slots is None:
+        return None
+
+    intent, term = slots["intent"], slots.get("term")
+    date_expr, week = slots.get("date"), slots.get("week")
+    sid, temp = (user_session or {}).get("sid"), (user_session or {}).get("temp")
+    if intent in LOGIN_INTENTS and not (sid and temp):
+        return None   # the LLM walks the user through logging in
+    if (date_expr or week) and intent not in ("homework", "worksheet"):
+        return None
+    if term and intent not in ("term_result", "unit_test"):
+        return None
+
+    if intent == "calendar":
+        return [("get_calendar", {})]
+    if intent == "syllabus":
+        return [("get_syllabus", {"temp": temp})]
+    if intent in ("term_result", "unit_test"):
+        if not term:
+            return None   # the LLM asks which term
+        name = "get_term_result" if intent == "term_result" else "get_unit_test_result"
+        return [(name, {"sid": sid, "temp": temp, "term": term})]
+    if week:
+        return [(f"get_{intent}_range", {"temp": temp, "start": week})]
+    return [(f"get_{intent}", {"temp": temp, "entry_date": date_expr or "today"})]
+
+
+def is_fast_path(message) -> bool:
+    return isinstance(message, AIMessage) and bool(message.response_metadata.get("fast_path"))
+
+
+def router_node(state: ChatState) -> ChatState:
+    """Answer obvious requests with a direct tool call instead of an LLM round trip."""
+    last = state["messages"][-1] if state["messages"] else None
+    calls = None
+    if FAST_PATH and isinstance(last, HumanMessage):
+        calls = route_intent(last.content, state.get("user_session", {}))
+
+    if not calls:
+        router_stats["llm"] += 1
+        return {}
+
+    # Skips the tool-choosing call and the follow-up reply the frontend would hide
+    router_stats["fast_path"] += 1
+    router_stats["llm_calls_saved"] += 2
+    router_stats["seconds_saved"] += 2 * (_llm_latency or 0.0)
+    print(f"⚡ Fast path: {', '.join(name for name, _ in calls)}")
+    tool_calls = [{"name": name, "args": args, "id": f"fast_{uuid.uuid4().hex[:12]}"} for name, args in calls]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls, response_metadata={"fast_path": True})]}
+
+
+def route_after_router(state: ChatState) -> str:
+    return "tools" if is_fast_path(state["messages"][-1]) else "chat_node"
+
+
+def fast_path_stats() -> dict:
+    """How often the router answered without the LLM and roughly how much time that saved."""
+    routed = router_stats["fast_path"] + router_stats["llm"]
+    return {
+        **router_stats,
+        "hit_rate": router_stats["fast_path"] / routed if routed else 0.0,
+        "llm_latency_s": _llm_latency,
+    }
+
+
+# =============================
+# RENDER-ONLY TOOLS
+# =============================
+# The frontend draws these results itself and hides the assistant text that
+# follows them, so a second LLM completion after them is wasted. When every
+# call of a turn is one of these and succeeded, the run ends ("end"), or
+# closes with a canned line ("template"). Errors, stale data, logins and
+# document answers still go back to the LLM, fast path or not;
+# FIONA_AFTER_RENDER_TOOLS=llm restores the old behaviour.
+AFTER_RENDER_TOOLS = os.getenv("FIONA_AFTER_RENDER_TOOLS", "end")
+
+RENDER_TEMPLATES = {
+    "get_term_result": "এখানে আপনার Term Result। 📊",
+    "get_unit_test_result": "এখানে আপনার Class Test এর ফলাফল। 📝",
+    "get_homework": "এখানে আপনার হোমওয়ার্ক। 📚",
+    "get_homework_range": "এখানে আপনার হোমওয়ার্ক। 📚",
+    "get_syllabus": "এখানে আপনার সিলেবাস। 📄",
+    "get_worksheet": "এখানে আপনার ওয়ার্কশিট। 📝",
+    "get_worksheet_range": "এখানে আপনার ওয়ার্কশিট। 📝",
+    "get_calendar": "এখানে স্কুলের ক্যালেন্ডার। 📅",
+}
+RENDER_ONLY_TOOLS = set(RENDER_TEMPLATES)
+
+
+def last_tool_turn(state: ChatState) -> tuple:
+    """The AIMessage that requested the latest tool calls and the results that followed it."""
+    results = []
+    for message in reversed(state["messages"]):
+        if isinstance(message, ToolMessage):
+            results.append(message)
+        elif isinstance(message, AIMessage):
+            return message, results[::-1]
+    return None, results[::-1]
+
+
+def rendered_successfully(message) -> bool:
+    if message.name not in RENDER_ONLY_TOOLS or message.status == "error":
+        return False
+    result = message.artifact if isinstance(message.artifact, dict) else {}
+    # Stale data and ranges with missing days still go to the LLM, which tells the user
+    return (result.get("status") == "success" and not result.get("error")
+            and not result.get("stale") and not result.get("failed_dates"))
+
+
+def route_after_tools(state: ChatState) -> str:
+    """Skip the follow-up LLM call when the frontend will show everything itself."""
+    turn, results = last_tool_turn(state)
+    settled = bool(results) and all(rendered_successfully(m) for m in results)
+    if is_fast_path(turn):
+        if not settled:
+            # The router counted this reply as saved, but errors and stale data need it
+            router_stats["llm_calls_saved"] -= 1
+            router_stats["seconds_saved"] -= _llm_latency or 0.0
+            return "chat_node"
+        return "render_reply" if AFTER_RENDER_TOOLS == "template" else END
+    if AFTER_RENDER_TOOLS == "llm" or not settled:
+        return "chat_node"
+
+    router_stats["llm_calls_saved"] += 1
+    router_stats["seconds_saved"] += _llm_latency or 0.0
+    return "render_reply" if AFTER_RENDER_TOOLS == "template" else END
+
+
+def render_reply(state: ChatState) -> ChatState:
+    """A short canned reply for successful render-only results (template mode)."""
+    _, results = last_tool_turn(state)
+    lines = []
+    for message in results:
+        line = RENDER_TEMPLATES.get(message.name)
+        if rendered_successfully(message) and line not in lines:
+            lines.append(line)
+    if not lines:
+        return {}
+    return {"messages": [AIMessage(content="\n".join(lines + ["আর কিছু জানতে চান? 😊"]))]}
+
 
-chatbot = graph.compile()
+# =============================
+# TOOL MEMORY
+# =============================
+# The last few successful results (their compact projections) are kept in
+# the state per session and shown in the prompt, so "what was my math
+# grade?" is answered from memory even after the ToolMessage itself has
+# been trimmed or summarized away. Entries belong to the student whose
+# sid/temp fetched them and disappear from the prompt when someone else is
+# logged in; "New Chat" starts a new thread and so an empty memory.
+TOOL_MEMORY = os.getenv("FIONA_TOOL_MEMORY", "1") != "0"
+TOOL_MEMORY_ENTRIES = int(os.getenv("FIONA_TOOL_MEMORY_ENTRIES", "8"))
+TOOL_MEMORY_TOKENS = int(os.getenv("FIONA_TOOL_MEMORY_TOKENS", "1200"))
+
+
+def memory_owner(args: dict):
+    return args.get("temp") or args.get("sid") or None
+
+
+def session_owners(state: ChatState) -> set:
+    """Owners whose entries the current session may see: its student, plus None for public tools."""
+    session = state.get("user_session") or {}
+    return {None, session.get("temp"), session.get("sid")} - {""}
+
+
+def visible_tool_memory(state: ChatState) -> list:
+    if not TOOL_MEMORY:
+        return []
+    owners = session_owners(state)
+    return [entry for entry in (state.get("tool_memory") or {}).values() if entry["owner"] in owners]
+
+
+def memory_args(args: dict) -> dict:
+    """A call's arguments as remembered: no credentials, and "today" or "this
+    week" resolved to the dates they meant, since threads outlive the day."""
+    args = {k: v for k, v in args.items() if k not in ("sid", "temp")}
+    if "entry_date" in args:
+        args["entry_date"] = normalize_entry_date(args["entry_date"])
+    if "start" in args:
+        try:
+            first, last = parse_date_range(args["start"], args.get("end", ""))
+        except ValueError:
+            return args
+        args["start"], args["end"] = first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")
+    return args
+
+
+def tool_memory_prompt(entries: list) -> str:
+    if not entries:
+        return ""
+    lines = []
+    for entry in entries:
+        args = ", ".join(f"{k}={v}" for k, v in entry["args"].items())
+        lines.append(f"- {entry['tool']}({args}): {entry['result']}")
+    # Dates above are absolute; the model needs today's to match "today" against them
+    return TOOL_MEMORY_HEADER + f"Today is {date.today():%Y-%m-%d}.\n" + "\n".join(lines) + "\n"
+
+
+def limit_tool_memory(memory: dict) -> dict:
+    """Drop the oldest entries until the memory fits TOOL_MEMORY_ENTRIES and TOOL_MEMORY_TOKENS."""
+    keys = list(memory)
+    while keys and (len(keys) > TOOL_MEMORY_ENTRIES
+                    or cached_token_count(tool_memory_prompt([memory[k] for k in keys])) > TOOL_MEMORY_TOKENS):
+        keys.pop(0)
+    return {k: memory[k] for k in keys}
+
+
+def remember_tool_results(state: ChatState) -> ChatState:
+    """Record this step's successful render-only results in the session's tool memory."""
+    turn, results = last_tool_turn(state)
+    if not TOOL_MEMORY or turn is None:
+        return {}
+
+    calls = {call["id"]: call for call in turn.tool_calls}
+    # Entries of a student who has since logged out are dropped on the next write
+    owners = session_owners(state)
+    memory = {k: v for k, v in (state.get("tool_memory") or {}).items() if v["owner"] in owners}
+    changed = len(memory) != len(state.get("tool_memory") or {})
+    for message in results:
+        call = calls.get(message.tool_call_id)
+        if call is None or not rendered_successfully(message):
+            continue
+        args = memory_args(call["args"])
+        key = message.name + json.dumps(args, sort_keys=True, ensure_ascii=False)
+        memory.pop(key, None)   # re-insert so the newest result is last
+        memory[key] = {
+            "tool": message.name,
+            "args": args,
+            "result": message.content,
+            "owner": memory_owner(call["args"]),
+            "message_id": message.id,
+        }
+        changed = True
+    return {"tool_memory": limit_tool_memory(memory)} if changed else {}
+
+
+# =============================
+# TOKEN COUNTING
+# =============================
+TOKEN_ENCODING = os.getenv("FIONA_TOKEN_ENCODING", "o200k_base")  # gpt-4o family
+
+
+@functools.lru_cache(maxsize=1)
+def get_token_encoder():
+    import tiktoken
+
+    return tiktoken.get_encoding(TOKEN_ENCODING)
+
+
+def count_tokens(text: str) -> int:
+    return len(get_token_encoder().encode(text or ""))
+
+
+MESSAGE_TOKEN_OVERHEAD = 4   # role and separators around each chat message
+
+
+@functools.lru_cache(maxsize=None)
+def static_prompt_tokens() -> int:
+    """SYSTEM_PROMPT is the same for every session, so it is counted once."""
+    return count_tokens(SYSTEM_PROMPT)
+
+
+# Keys are the short per-session texts and message contents, never the
+# ~48 KB static prompt, so a small bound holds a few turns of many sessions
+@functools.lru_cache(maxsize=1024)
+def cached_token_count(text: str) -> int:
+    """count_tokens for text that is counted again every turn (session block, history)."""
+    return count_tokens(text)
+
+
+@functools.lru_cache(maxsize=None)
+def tool_schema_tokens(variant: str) -> int:
+    """Tokens of the tool schemas sent with every call of this variant."""
+    schemas = [convert_to_openai_tool(t) for t in TOOL_VARIANTS[variant]]
+    return count_tokens(json.dumps(schemas, ensure_ascii=False))
+
+
+def message_tokens(message) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    tokens = MESSAGE_TOKEN_OVERHEAD + cached_token_count(content)
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += cached_token_count(call["name"] + json.dumps(call["args"], ensure_ascii=False))
+    return tokens
+
+
+# =============================
+# TOOL RESULT PROJECTION
+# =============================
+# Tools return the full API payload, which the Streamlit renderers need. The
+# LLM only needs the few fields it can talk about, so the ToolMessage content
+# is replaced by a compact projection and the full payload rides along as the
+# message artifact.
+def _kind(result: dict) -> dict:
+    keys = ("status", "error", "exam_type", "type", "stale", "start", "end", "failed_dates")
+    return {k: result[k] for k in keys if k in result and result[k] != []}   # no empty failed_dates
+
+
+def project_term_result(result: dict) -> dict:
+    data = result.get("data") or {}
+    subjects = [f"{s.get('sub_name')}: {s.get('total_mark')} ({s.get('grade')})"
+                for s in data.get("result", []) if s.get("total_mark")]
+    return {**_kind(result), "gpa": data.get("gpa"), "total": data.get("grandTotal"), "subjects": subjects}
+
+
+def project_unit_test_result(result: dict) -> dict:
+    return {**_kind(result), "subjects": [f"{s.get('sub_name')}: {s.get('ct_mark')}" for s in result.get("data") or []]}
+
+
+def project_homework(result: dict) -> dict:
+    days = {}
+    for entry in result.get("data") or []:
+        notes = []
+        for n in entry.get("note", []):
+            parts = [f"cw: {n['cw'].strip()}" if (n.get("cw") or "").strip() else "",
+                     f"hw: {n['hw'].strip()}" if (n.get("hw") or "").strip() else ""]
+            notes.append(f"{n.get('subject')}: " + "; ".join(p for p in parts if p))
+        days.setdefault(entry.get("entry_date") or "date", []).extend(notes)
+    return {**_kind(result), "homework": days}
+
+
+def project_document_list(result: dict) -> dict:
+    titles = []
+    for d in result.get("data") or []:
+        title = d.get("wsTitle") or d.get("title") or d.get("calender_name") or d.get("fileName") or d.get("subject")
+        date = d.get("wsDate") or d.get("date")
+        titles.append(f"{title} ({date})" if date else title)
+    return {**_kind(result), "count": len(titles), "titles": titles}
+
+
+TOOL_PROJECTIONS = {
+    "get_term_result": project_term_result,
+    "get_unit_test_result": project_unit_test_result,
+    "get_homework": project_homework,
+    "get_homework_range": project_homework,
+    "get_syllabus": project_document_list,
+    "get_worksheet": project_document_list,
+    "get_worksheet_range": project_document_list,
+    "get_calendar": project_document_list,
+}
+
+
+def project_tool_message(message):
+    """Swap a ToolMessage's content for its compact projection, keeping the full payload as artifact."""
+    project = TOOL_PROJECTIONS.get(getattr(message, "name", None))
+    if project is None or not isinstance(message, ToolMessage):
+        return message
+    try:
+        result = json.loads(message.content)
+    except (TypeError, ValueError):
+        return message
+    if result.get("error") and not result.get("data"):
+        return message
+
+    message.artifact = result
+    message.content = json.dumps(project(result), ensure_ascii=False)
+    return message
+
+
+# =============================
+# PARALLEL TOOL EXECUTION
+# =============================
+# ToolNode runs all tool calls of one LLM turn concurrently and returns them
+# in call order, so a turn costs its slowest call. These hooks cap how many
+# calls run at once across the process and turn a crash in one call into an
+# error result for that call only.
+MAX_PARALLEL_TOOL_CALLS = int(os.getenv("FIONA_MAX_PARALLEL_TOOLS", "32"))
+
+_tool_slots = threading.BoundedSemaphore(MAX_PARALLEL_TOOL_CALLS)
+_async_tool_slots = asyncio.Semaphore(MAX_PARALLEL_TOOL_CALLS)
+
+
+def run_tool_call(request, execute):
+    with _tool_slots:
+        return project_tool_message(execute(request))
+
+
+async def arun_tool_call(request, execute):
+    async with _async_tool_slots:
+        return project_tool_message(await execute(request))
+
+
+def tool_error_result(e: Exception) -> str:
+    print(f"❌ Tool error: {e}")
+    return json.dumps({"status": "error", "error": str(e)})
+
+
+# =============================
+# CHECKPOINTING
+# =============================
+# The graph keeps each conversation itself, keyed by thread_id (the
+# Streamlit session_id), so a turn only has to send the new message.
+# "sqlite" survives process restarts, "memory" only reruns, and "none"
+# compiles a stateless graph whose callers send the history themselves
+# (benchmarks only; the app sends just the new message and refuses it).
+CHECKPOINTER = os.getenv("FIONA_CHECKPOINTER", "sqlite")
+CHECKPOINT_DB = os.getenv("FIONA_CHECKPOINT_DB", "fiona_checkpoints.sqlite")
+
+
+def make_checkpointer(kind: str = CHECKPOINTER):
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return InMemorySaver()
+    if kind == "sqlite":
+        return run_async(open_sqlite_checkpointer(CHECKPOINT_DB))
+    raise ValueError(f"Unknown FIONA_CHECKPOINTER: {kind}")
+
+
+async def open_sqlite_checkpointer(path: str):
+    """An AsyncSqliteSaver owned by the shared API loop.
+
+    Graph runs on that loop use it directly; sync callers (graph.invoke from
+    a Streamlit thread) are forwarded to the loop by the saver itself.
+    """
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    conn = await aiosqlite.connect(path)
+    await conn.execute("PRAGMA journal_mode=WAL")
+    saver = AsyncSqliteSaver(conn)
+    await saver.setup()
+    return saver
+
+
+def thread_config(session_id: str) -> dict:
+    return {"configurable": {"thread_id": str(session_id)}}
+
+
+# =============================
+# GRAPH
+# =============================
+def build_graph() -> StateGraph:
+    """The chatbot's StateGraph, uncompiled (benchmarks compile it with their own checkpointer)."""
+    tool_node = ToolNode(
+        tools,
+        handle_tool_errors=tool_error_result,
+        wrap_tool_call=run_tool_call,
+        awrap_tool_call=arun_tool_call,
+    )
 
-print("✅ Chatbot ready (stateless)")
+    graph = StateGraph(ChatState)
+    graph.add_node("summarize", RunnableLambda(summarize_node, afunc=asummarize_node))
+    graph.add_node("router", router_node)
+    graph.add_node("chat_node", RunnableLambda(chat_node, afunc=achat_node))
+    graph.add_node("tools", tool_node)
+    graph.add_node("remember", remember_tool_results)
+    graph.add_node("render_reply", render_reply)
+
+    graph.add_conditional_edges(START, route_start, ["summarize", "router"])
+    graph.add_edge("summarize", "router")
+    graph.add_conditional_edges("router", route_after_router, ["tools", "chat_node"])
+    graph.add_conditional_edges("chat_node", tools_condition)
+    graph.add_edge("tools", "remember")
+    graph.add_conditional_edges("remember", route_after_tools, ["chat_node", "render_reply", END])
+    graph.add_edge("render_reply", END)
+    return graph
+
+
+@functools.lru_cache(maxsize=1)
+def get_chatbot():
+    """The compiled chatbot with its checkpointer, built once per process on first use."""
+    chatbot = build_graph().compile(checkpointer=make_checkpointer())
+    print(f"✅ Chatbot ready (checkpointer: {CHECKPOINTER})")
+    return chatbot
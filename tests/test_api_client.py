@@ -0,0 +1,89 @@
+import asyncio
+
+import httpx
+import pytest
+
+import api_client
+from api_client import ServiceUnavailable, get_health, send_request
+
+
+class Upstream:
+    """An httpx transport whose next response the test decides."""
+
+    def __init__(self):
+        self.behaviour = "ok"
+        self.calls = 0
+
+    async def handle_async_request(self, request):
+        self.calls += 1
+        if self.behaviour == "hang":
+            await asyncio.sleep(60)
+        if self.behaviour == "bug":
+            raise ValueError("not a transport error")
+        return httpx.Response(200, json={"ok": True})
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    transport = Upstream()
+    monkeypatch.setattr(api_client, "_client", httpx.AsyncClient(transport=transport))
+    monkeypatch.setattr(api_client, "_health", {})
+    return transport
+
+
+def half_open(endpoint: str):
+    health = get_health(endpoint)
+    health.opened_at = -api_client.BREAKER_COOLDOWN * 2   # cooled down long ago
+    assert health.state() == "half-open"
+    return health
+
+
+def test_cancelled_probe_lets_the_next_call_probe(upstream):
+    async def scenario():
+        health = half_open("getDiary")
+        upstream.behaviour = "hang"
+        probe = asyncio.ensure_future(send_request("POST", "getDiary", False))
+        await asyncio.sleep(0.01)
+        assert health.probing
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert not health.probing
+
+        upstream.behaviour = "ok"
+        response = await send_request("POST", "getDiary", False)
+        return health, response
+
+    health, response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert health.state() == "closed"
+
+
+def test_probe_failing_with_other_errors_is_released(upstream):
+    async def scenario():
+        health = half_open("getDiary")
+        upstream.behaviour = "bug"
+        with pytest.raises(ValueError):
+            await send_request("POST", "getDiary", False)
+        assert not health.probing
+        assert health.state() == "half-open"
+
+        upstream.behaviour = "ok"
+        return await send_request("POST", "getDiary", False)
+
+    assert asyncio.run(scenario()).status_code == 200
+
+
+def test_only_one_probe_at_a_time(upstream):
+    async def scenario():
+        half_open("getDiary")
+        upstream.behaviour = "hang"
+        probe = asyncio.ensure_future(send_request("POST", "getDiary", False))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ServiceUnavailable):
+            await send_request("POST", "getDiary", False)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert upstream.calls == 1
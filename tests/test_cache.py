@@ -0,0 +1,29 @@
+import asyncio
+
+import httpx
+import pytest
+
+from cache import RevalidatingCache
+
+
+def test_cancelled_caller_does_not_cancel_a_shared_cold_refresh():
+    release = asyncio.Event()
+
+    async def fetch(headers):
+        await release.wait()
+        return httpx.Response(200, json=["event"])
+
+    async def scenario():
+        cache = RevalidatingCache("Calendar", fetch)
+        impatient = asyncio.ensure_future(cache.get())
+        patient = asyncio.ensure_future(cache.get())
+        await asyncio.sleep(0)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        release.set()
+        return cache, await patient
+
+    cache, value = asyncio.run(scenario())
+    assert value == ["event"]
+    assert cache.stats["refreshes"] == 1 and cache.value == ["event"]
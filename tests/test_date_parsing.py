@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+
+import pytest
+
+from streamlit_backend import MAX_RANGE_DAYS, parse_date, parse_date_range
+
+WEDNESDAY = date(2026, 10, 14)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("today", date(2026, 10, 14)),
+    ("Tomorrow", date(2026, 10, 15)),
+    ("yesterday", date(2026, 10, 13)),
+    ("আজ", date(2026, 10, 14)),
+    ("আগামীকাল", date(2026, 10, 15)),
+    ("গতকাল", date(2026, 10, 13)),
+    # "this <day>" stays inside the Monday-Sunday week, like "this week"
+    ("this monday", date(2026, 10, 12)),
+    ("this wednesday", date(2026, 10, 14)),
+    ("this sunday", date(2026, 10, 18)),
+    # a bare day or "next <day>" is the next one still to come
+    ("monday", date(2026, 10, 19)),
+    ("friday", date(2026, 10, 16)),
+    ("wednesday", date(2026, 10, 14)),
+    ("next monday", date(2026, 10, 19)),
+    ("next wednesday", date(2026, 10, 21)),
+    ("last monday", date(2026, 10, 12)),
+    ("last wednesday", date(2026, 10, 7)),
+    ("last friday", date(2026, 10, 9)),
+    ("2025-01-31", date(2025, 1, 31)),
+    ("31-01-2025", date(2025, 1, 31)),
+    ("31/01/2025", date(2025, 1, 31)),
+    ("31 January 2025", date(2025, 1, 31)),
+    ("31 jan 2025", date(2025, 1, 31)),
+])
+def test_parse_date(expression, expected):
+    assert parse_date(expression, WEDNESDAY) == expected
+
+
+@pytest.mark.parametrize("expression", ["someday", "", "2025-13-01", "this"])
+def test_parse_date_rejects_unknown(expression):
+    with pytest.raises(ValueError):
+        parse_date(expression, WEDNESDAY)
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    ("this week", "", (date(2026, 10, 12), date(2026, 10, 18))),
+    ("next week", "", (date(2026, 10, 19), date(2026, 10, 25))),
+    ("last week", "", (date(2026, 10, 5), date(2026, 10, 11))),
+    ("এই সপ্তাহ", "", (date(2026, 10, 12), date(2026, 10, 18))),
+    ("আগামী সপ্তাহের", "", (date(2026, 10, 19), date(2026, 10, 25))),
+    ("today", "", (date(2026, 10, 14), date(2026, 10, 14))),
+    ("this monday", "this friday", (date(2026, 10, 12), date(2026, 10, 16))),
+    ("2026-10-20", "2026-10-16", (date(2026, 10, 16), date(2026, 10, 20))),   # swapped ends
+])
+def test_parse_date_range(start, end, expected):
+    assert parse_date_range(start, end, WEDNESDAY) == expected
+
+
+def test_this_monday_is_inside_this_week():
+    first, last = parse_date_range("this week", "", WEDNESDAY)
+    for day in ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"):
+        assert first <= parse_date(f"this {day}", WEDNESDAY) <= last
+
+
+def test_parse_date_range_limit():
+    first = date(2026, 1, 1)
+    longest = first + timedelta(days=MAX_RANGE_DAYS - 1)
+    assert parse_date_range(str(first), str(longest), WEDNESDAY) == (first, longest)
+    with pytest.raises(ValueError):
+        parse_date_range(str(first), str(longest + timedelta(days=1)), WEDNESDAY)
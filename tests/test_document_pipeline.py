@@ -0,0 +1,66 @@
+import math
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from document_pipeline import batched, iter_chunks
+
+SPLITTER = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=30)
+
+
+def pages(count, words_per_page=120):
+    """Pages of unique words (w0, w1, ...) with a paragraph break now and then."""
+    out, n = [], 0
+    for _ in range(count):
+        words = []
+        for i in range(words_per_page):
+            words.append(f"w{n}" + ("\n\n" if i % 40 == 39 else ""))
+            n += 1
+        out.append(" ".join(words))
+    return out
+
+
+def test_one_buffer_matches_a_single_split():
+    text = pages(3)
+    assert list(iter_chunks(text, SPLITTER, min_chars=10 ** 6)) == SPLITTER.split_text("\n".join(text))
+
+
+@pytest.mark.parametrize("min_chars", [500, 2000, 8000])
+def test_streaming_keeps_all_text_in_order(min_chars):
+    text = pages(40)
+    chunks = list(iter_chunks(text, SPLITTER, min_chars=min_chars))
+
+    assert all(len(chunk) <= SPLITTER._chunk_size for chunk in chunks)
+    seen = []
+    for chunk in chunks:
+        for word in chunk.split():
+            if not seen or int(word[1:]) > seen[-1]:
+                seen.append(int(word[1:]))
+    assert seen == list(range(40 * 120))   # every word, first seen in order
+
+
+def mixed_pieces(count):
+    """Pieces of uneven length mixing sentences, line and paragraph breaks."""
+    random.seed(1)
+    words = ["alpha", "beta", "gamma.", "delta\n", "eps\n\n", "zeta"]
+    return [" ".join(random.choice(words) for _ in range(random.randint(0, 400))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("text", [pages(40), mixed_pieces(60)], ids=["pages", "mixed"])
+@pytest.mark.parametrize("min_chars", [500, 2000, 8000])
+def test_chunk_count_differs_by_at_most_one_per_buffer(text, min_chars):
+    whole = SPLITTER.split_text("\n".join(t for t in text if t.strip()))
+    streamed = list(iter_chunks(text, SPLITTER, min_chars=min_chars))
+    buffers = math.ceil(sum(len(t) for t in text) / min_chars)
+    assert abs(len(streamed) - len(whole)) <= buffers
+
+
+def test_blank_pieces_are_skipped():
+    assert list(iter_chunks(["", "  \n", "hello world", "\n"], SPLITTER)) == ["hello world"]
+    assert list(iter_chunks([], SPLITTER)) == []
+
+
+def test_batched():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batched([], 3)) == []
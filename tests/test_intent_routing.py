@@ -0,0 +1,85 @@
+import unicodedata
+
+import pytest
+
+from streamlit_backend import parse_intent, route_intent
+
+LOGGED_IN = {"sid": "1001", "temp": "T1001", "name": "Student 1001"}
+
+
+@pytest.mark.parametrize("text, slots", [
+    ("calendar", {"intent": "calendar"}),
+    ("Show me the calendar please!", {"intent": "calendar"}),
+    ("term 2 result", {"intent": "term_result", "term": "2"}),
+    ("my 2nd term result?", {"intent": "term_result", "term": "2"}),
+    ("class test 1", {"intent": "unit_test", "term": "1"}),
+    ("homework next monday", {"intent": "homework", "date": "next monday"}),
+    ("worksheet this week", {"intent": "worksheet", "week": "this week"}),
+    ("homework 2026-10-20", {"intent": "homework", "date": "2026-10-20"}),
+    ("আজকের হোমওয়ার্ক", {"intent": "homework", "date": "আজকের"}),
+    ("আমার দ্বিতীয় টার্মের রেজাল্ট দাও", {"intent": "term_result", "term": "2"}),
+    ("২ টার্মের ফলাফল", {"intent": "term_result", "term": "2"}),
+    ("ক্লাস টেস্ট ১", {"intent": "unit_test", "term": "1"}),
+    ("এই সপ্তাহের বাড়ির কাজ", {"intent": "homework", "week": "এই সপ্তাহের"}),
+    ("ক্যালেন্ডার", {"intent": "calendar"}),
+])
+def test_parse_intent(text, slots):
+    assert parse_intent(text) == slots
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "hello",
+    "what is my math grade in the term 2 result",    # unknown words
+    "calendar and homework",                          # "and" is not in the vocabulary
+    "homework worksheet",                             # two intents
+    "term 1 result term 2",                           # two terms
+    "homework today tomorrow",                        # two dates
+    "আমার রেজাল্ট কেমন হয়েছে",                          # unknown Bangla words
+    "please",                                         # no intent at all
+])
+def test_parse_intent_falls_back(text):
+    assert parse_intent(text) is None
+
+
+def test_parse_intent_repeated_slot_is_not_a_conflict():
+    assert parse_intent("result term 2 result") == {"intent": "term_result", "term": "2"}
+
+
+def test_parse_intent_normalises_bangla():
+    # য় typed as য + nukta must match the precomposed vocabulary
+    decomposed = unicodedata.normalize("NFD", "হোমওয়ার্ক")
+    assert decomposed != unicodedata.normalize("NFC", decomposed)
+    assert parse_intent(decomposed) == {"intent": "homework"}
+
+
+@pytest.mark.parametrize("text, calls", [
+    ("calendar", [("get_calendar", {})]),
+    ("syllabus", [("get_syllabus", {"temp": "T1001"})]),
+    ("term 2 result", [("get_term_result", {"sid": "1001", "temp": "T1001", "term": "2"})]),
+    ("ক্লাস টেস্ট ৩", [("get_unit_test_result", {"sid": "1001", "temp": "T1001", "term": "3"})]),
+    ("homework", [("get_homework", {"temp": "T1001", "entry_date": "today"})]),
+    ("আগামীকাল হোমওয়ার্ক", [("get_homework", {"temp": "T1001", "entry_date": "আগামীকাল"})]),
+    ("worksheet next week", [("get_worksheet_range", {"temp": "T1001", "start": "next week"})]),
+    ("homework last friday", [("get_homework", {"temp": "T1001", "entry_date": "last friday"})]),
+])
+def test_route_intent(text, calls):
+    assert route_intent(text, LOGGED_IN) == calls
+
+
+@pytest.mark.parametrize("text, session", [
+    ("term 2 result", {}),                          # needs a login
+    ("homework", None),
+    ("syllabus", {"sid": "1001"}),                  # no temp token
+    ("result", LOGGED_IN),                          # the LLM asks which term
+    ("calendar today", LOGGED_IN),                  # a date the calendar cannot use
+    ("syllabus term 2", LOGGED_IN),                 # a term the syllabus cannot use
+    ("result this week", LOGGED_IN),
+    ("tell me a joke", LOGGED_IN),
+])
+def test_route_intent_falls_back_to_llm(text, session):
+    assert route_intent(text, session) is None
+
+
+def test_calendar_needs_no_login():
+    assert route_intent("ক্যালেন্ডার দেখাও", {}) == [("get_calendar", {})]
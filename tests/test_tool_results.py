@@ -0,0 +1,97 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import ToolMessage
+
+import streamlit_backend
+from streamlit_backend import (
+    get_homework_range, get_worksheet_range, project_document_list, project_homework, rendered_successfully,
+)
+
+WEEK = ("2026-10-12", "2026-10-18")
+
+
+def fake_day_tool(results: dict, default: dict):
+    """Stands in for get_homework/get_worksheet: a per-day result, `default` for the other days."""
+    async def coroutine(temp, day):
+        return json.dumps(results.get(day, default))
+    return SimpleNamespace(coroutine=coroutine)
+
+
+def homework_day(day: str) -> dict:
+    return {"status": "success", "exam_type": "homework", "data": [{"note": [{"subject": "Math", "hw": day}]}]}
+
+
+def worksheet_day(day: str) -> dict:
+    return {"status": "success", "type": "worksheet", "data": [{"wsTitle": f"Sheet {day}"}]}
+
+
+def run_range(tool, monkeypatch, day_tool_name: str, day_tool) -> dict:
+    monkeypatch.setattr(streamlit_backend, day_tool_name, day_tool)
+    return json.loads(asyncio.run(tool.coroutine("T1001", *WEEK)))
+
+
+def as_message(name: str, result: dict) -> ToolMessage:
+    return ToolMessage(content="{}", name=name, tool_call_id="call-1", artifact=result)
+
+
+def test_homework_range_settled(monkeypatch):
+    result = run_range(get_homework_range, monkeypatch, "get_homework",
+                       fake_day_tool({"2026-10-13": homework_day("2026-10-13")}, {"status": "success", "data": []}))
+    assert result["failed_dates"] == [] and "stale" not in result
+    assert rendered_successfully(as_message("get_homework_range", result))
+
+
+def test_homework_range_marks_stale_days(monkeypatch):
+    stale = {**homework_day("2026-10-13"), "stale": True}
+    result = run_range(get_homework_range, monkeypatch, "get_homework",
+                       fake_day_tool({"2026-10-13": stale}, homework_day("any")))
+    assert result["stale"] is True
+    assert not rendered_successfully(as_message("get_homework_range", result))
+
+
+def test_homework_range_with_failed_days_is_not_settled(monkeypatch):
+    failed = {"error": "Unable to fetch homework", "exam_type": "homework"}
+    result = run_range(get_homework_range, monkeypatch, "get_homework",
+                       fake_day_tool({"2026-10-14": failed, "2026-10-15": failed}, homework_day("any")))
+    assert result["status"] == "success"
+    assert result["failed_dates"] == ["2026-10-14", "2026-10-15"]
+    assert not rendered_successfully(as_message("get_homework_range", result))
+
+
+@pytest.mark.parametrize("day, settled", [
+    ({"error": "No worksheets found", "type": "worksheet"}, True),   # an empty day, not a failure
+    ({"error": "Unable to fetch worksheets", "type": "worksheet"}, False),
+    ({**worksheet_day("2026-10-14"), "stale": True}, False),
+])
+def test_worksheet_range_settled_only_when_complete_and_current(monkeypatch, day, settled):
+    result = run_range(get_worksheet_range, monkeypatch, "get_worksheet",
+                       fake_day_tool({"2026-10-14": day}, worksheet_day("any")))
+    assert result["status"] == "success"
+    assert rendered_successfully(as_message("get_worksheet_range", result)) is settled
+
+
+def test_project_homework_keeps_failed_dates(monkeypatch):
+    failed = {"error": "Unable to fetch homework", "exam_type": "homework"}
+    result = run_range(get_homework_range, monkeypatch, "get_homework",
+                       fake_day_tool({"2026-10-14": failed}, homework_day("any")))
+    projected = project_homework(result)
+    assert projected["failed_dates"] == ["2026-10-14"]
+    assert (projected["start"], projected["end"]) == WEEK
+    assert "2026-10-14" not in projected["homework"] and len(projected["homework"]) == 6
+
+
+def test_project_document_list_keeps_failed_dates(monkeypatch):
+    failed = {"error": "Unable to fetch worksheets", "type": "worksheet"}
+    result = run_range(get_worksheet_range, monkeypatch, "get_worksheet",
+                       fake_day_tool({"2026-10-12": failed, "2026-10-18": failed}, worksheet_day("any")))
+    projected = project_document_list(result)
+    assert projected["failed_dates"] == ["2026-10-12", "2026-10-18"]
+    assert projected["count"] == 5
+
+
+def test_projection_omits_empty_failed_dates(monkeypatch):
+    result = run_range(get_homework_range, monkeypatch, "get_homework", fake_day_tool({}, homework_day("any")))
+    assert "failed_dates" not in project_homework(result)